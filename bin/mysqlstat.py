@@ -1,20 +1,79 @@
 import sys
+import os
+import json
+import heapq
+import hashlib
+import bisect
 import pymysql
 import time
 import re
+from collections import deque
+from datetime import date, datetime
 from decimal import Decimal
-from datetime import datetime
 from prettytable import PrettyTable
 import textwrap
 import signal
 import argparse
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 from pymysqlreplication import BinLogStreamReader
+from pymysqlreplication.event import FormatDescriptionEvent
 from pymysqlreplication.row_event import (
     WriteRowsEvent,
     UpdateRowsEvent,
     DeleteRowsEvent
 )
 
+# 各整数类型自增字段的最大值，格式为 (有符号最大值, 无符号最大值)
+INTEGER_TYPE_MAX = {
+    'tinyint': (127, 255),
+    'smallint': (32767, 65535),
+    'mediumint': (8388607, 16777215),
+    'int': (2147483647, 4294967295),
+    'bigint': (9223372036854775807, 18446744073709551615),
+}
+
+# 命令行 --format 的值：table 以 PrettyTable 文本输出，jsonl 每行输出一个JSON对象
+output_format = 'table'
+
+# jsonl 格式时结构化记录写入的流（启动时的标准输出），其余提示信息改写到标准错误
+record_stream = sys.stdout
+
+
+def _json_default(value):
+    # 查询结果中 json 模块不能直接序列化的类型
+    if isinstance(value, Decimal):
+        return int(value) if value == value.to_integral_value() else float(value)
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, bytes):
+        return value.decode('utf-8', 'replace')
+    return str(value)
+
+
+def emit_rows(record_type: str, field_names: list, rows: list):
+    """
+    以 JSON Lines 格式输出记录，每行一个JSON对象，带记录类型和采样时间。
+    field_names 是稳定的英文字段名，rows 是未经格式化的原始值（数值、完整的SQL文本等），
+    单位体现在字段名里（如 _bytes、_ms）。每批写完立即flush，下游可以边采样边消费。
+    """
+    now = datetime.now().isoformat(timespec='seconds')
+    for row in rows:
+        record = {"type": record_type, "time": now}
+        record.update(zip(field_names, row))
+        record_stream.write(json.dumps(record, ensure_ascii=False, default=_json_default) + "\n")
+    record_stream.flush()
+
+
+def emit_table(table: PrettyTable, record_type: str, field_names: list, rows: list):
+    """
+    输出一个结果表格。table 格式打印格式化好的 PrettyTable；
+    jsonl 格式输出 field_names/rows 给出的原始值，不使用表格里为显示而格式化的内容。
+    """
+    if output_format == 'jsonl':
+        emit_rows(record_type, field_names, rows)
+    else:
+        print(table)
+
 
 def mysql_status_monitor(mysql_ip: str, mysql_port: int, mysql_user: str, mysql_password: str):
     """
@@ -131,6 +190,16 @@ def mysql_status_monitor(mysql_ip: str, mysql_port: int, mysql_user: str, mysql_
                        conn_count, max_conn, "{:.2f}".format(recv_mbps) + " MBit/s",
                        "{:.2f}".format(send_mbps) + " MBit/s"])
 
+        if output_format == 'jsonl':
+            # 每秒只输出新采样的一行，不重复输出整张表
+            emit_rows("status", ["select_per_sec", "insert_per_sec", "update_per_sec", "delete_per_sec",
+                                 "threads_connected", "max_connections", "recv_mbps", "send_mbps"],
+                      [[select_per_second, insert_per_second, update_per_second, delete_per_second,
+                        int(conn_count), int(max_conn), round(recv_mbps, 3), round(send_mbps, 3)]])
+            table.clear_rows()
+            time.sleep(1)
+            continue
+
         # 清空控制台
         print("\033c", end="")
 
@@ -187,9 +256,12 @@ def show_frequently_sql(mysql_ip: str, mysql_port: int, mysql_user: str, mysql_p
         sys.exit(0)
     else:
         cursor.execute("SET @sys.statement_truncate_len = 1024")
+        # jsonl 格式查询 x$ 视图，时间是未格式化的皮秒数
+        view = "sys.x$statement_analysis" if output_format == 'jsonl' else "sys.statement_analysis"
         cursor.execute(
-            f"select query,db,last_seen,exec_count,max_latency,avg_latency from sys.statement_analysis order by exec_count desc, last_seen desc limit {top}")
+            f"select query,db,last_seen,exec_count,max_latency,avg_latency from {view} order by exec_count desc, last_seen desc limit {top}")
         top_info = cursor.fetchall()
+        records = []
 
         # 创建表格对象
         table = PrettyTable()
@@ -212,15 +284,136 @@ def show_frequently_sql(mysql_ip: str, mysql_port: int, mysql_user: str, mysql_p
             # 添加数据到表格中
             # table.add_row([query, db, last_seen, exec_count, max_latency, avg_latency])
             table.add_row([wrapped_query, db, last_seen, exec_count, max_latency, avg_latency])
+            records.append([query, db, last_seen, exec_count, max_latency, avg_latency])
 
         # 输出表格
-        print(table)
+        emit_table(table, "frequently_sql", ["query", "db", "last_seen", "exec_count", "max_latency_ps",
+                                             "avg_latency_ps"], records)
 
         # 关闭游标和连接
         cursor.close()
         conn.close()
 
 
+def show_frequently_sql_delta(mysql_ip: str, mysql_port: int, mysql_user: str, mysql_password: str, top: int,
+                              interval: float):
+    """
+    mysql状态监控工具，按采样间隔统计当前最热的前N条SQL语句。
+    每次采样 performance_schema.events_statements_summary_by_digest，与内存中上一次的快照按digest做
+    哈希关联求差值，按间隔内的执行次数和执行耗时增量排序，只取前N条，不对整张表重新排序。
+    Args:
+        mysql_ip: str, MySQL服务器IP地址
+        mysql_port: int, MySQL服务器端口号
+        mysql_user: str, MySQL用户名
+        mysql_password: str, MySQL用户密码
+        top: int, 显示前N条SQL语句
+        interval: float, 采样间隔（秒）
+    Returns:
+        None
+    """
+
+    # 连接MySQL数据库
+    conn = pymysql.connect(
+        host=mysql_ip,
+        port=mysql_port,
+        user=mysql_user,
+        password=mysql_password,
+        autocommit=True
+    )
+
+    def signal_handler(sig, frame):
+        print('程序被终止')
+        sys.exit(0)
+
+    # 注册信号处理函数
+    signal.signal(signal.SIGINT, signal_handler)  # Ctrl+C
+    signal.signal(signal.SIGTSTP, signal_handler)  # Ctrl+Z
+
+    # 创建游标对象
+    cursor = conn.cursor()
+
+    cursor.execute("SELECT @@performance_schema")
+    if cursor.fetchone()[0] == 0:
+        print("performance_schema参数未开启。")
+        print("在my.cnf配置文件里添加performance_schema=1，并重启mysqld进程生效。")
+        sys.exit(0)
+
+    # 快照不拉取DIGEST_TEXT，只对进入前N的digest按需查询并缓存语句文本
+    snapshot_sql = ("SELECT SCHEMA_NAME, DIGEST, COUNT_STAR, SUM_TIMER_WAIT, SUM_ROWS_EXAMINED "
+                    "FROM performance_schema.events_statements_summary_by_digest WHERE DIGEST IS NOT NULL")
+    digest_text_cache = {}
+
+    def take_snapshot():
+        cursor.execute(snapshot_sql)
+        return {(row[0], row[1]): (int(row[2]), int(row[3]), int(row[4])) for row in cursor.fetchall()}
+
+    prev_snapshot = take_snapshot()
+    prev_ts = time.time()
+
+    while True:
+        time.sleep(interval)
+
+        snapshot = take_snapshot()
+        now = time.time()
+        elapsed = now - prev_ts
+
+        # 哈希关联求差值；计数变小说明摘要表被清空或digest被淘汰，此时以当前值作为增量
+        deltas = []
+        for key, (count_star, sum_timer_wait, rows_examined) in snapshot.items():
+            prev = prev_snapshot.get(key)
+            if prev is None or count_star < prev[0]:
+                delta = (count_star, sum_timer_wait, rows_examined)
+            else:
+                delta = (count_star - prev[0], sum_timer_wait - prev[1], rows_examined - prev[2])
+            if delta[0] > 0:
+                deltas.append((key, delta))
+
+        prev_snapshot = snapshot
+        prev_ts = now
+
+        top_items = heapq.nlargest(top, deltas, key=lambda x: (x[1][0], x[1][1]))
+
+        # 按需查询未缓存的语句文本
+        missing = [digest for (schema_name, digest), _ in top_items if digest not in digest_text_cache]
+        if missing:
+            cursor.execute("SELECT DIGEST, DIGEST_TEXT FROM performance_schema.events_statements_summary_by_digest "
+                           "WHERE DIGEST IN ({})".format(','.join(['%s'] * len(missing))), missing)
+            for digest, digest_text in cursor.fetchall():
+                digest_text_cache[digest] = digest_text
+
+        # 创建表格对象
+        table = PrettyTable()
+        table.field_names = ["执行语句", "数据库名", "间隔内执行次数", "每秒执行次数", "间隔内总耗时(ms)",
+                             "平均执行时间(ms)", "平均扫描行数"]
+
+        # 设置每列的对齐方式为左对齐
+        table.align = "l"
+
+        records = []
+        for (schema_name, digest), (exec_count, timer_wait, rows_examined) in top_items:
+            # 处理自动换行
+            wrapped_query = '\n'.join(textwrap.wrap(str(digest_text_cache.get(digest)), width=70))
+
+            # performance_schema 的计时单位是皮秒
+            total_ms = timer_wait / 1000000000
+            table.add_row([wrapped_query, schema_name, exec_count, "{:.1f}".format(exec_count / elapsed),
+                           "{:.2f}".format(total_ms), "{:.3f}".format(total_ms / exec_count),
+                           "{:.1f}".format(rows_examined / exec_count)])
+            records.append([digest_text_cache.get(digest), digest, schema_name, exec_count, exec_count / elapsed,
+                            total_ms, total_ms / exec_count, rows_examined / exec_count])
+
+        # 清空控制台
+        print("\033c", end="")
+
+        print(f"采样时间：{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}  采样间隔：{elapsed:.1f}秒  "
+              f"活跃digest数量：{len(deltas)}")
+        emit_table(table, "frequently_sql_delta", ["query", "digest", "db", "exec_count", "exec_per_sec", "total_ms",
+                                                   "avg_ms", "avg_rows_examined"], records)
+
+        # 输出表格后立即清空缓冲区
+        sys.stdout.flush()
+
+
 def show_frequently_io(mysql_ip: str, mysql_port: int, mysql_user: str, mysql_password: str, io: int):
     """
     mysql状态监控工具，统计访问次数最频繁的前N个表文件ibd。
@@ -255,9 +448,12 @@ def show_frequently_io(mysql_ip: str, mysql_port: int, mysql_user: str, mysql_pa
         sys.exit(0)
     else:
         cursor.execute("SET @sys.statement_truncate_len = 1024")
+        # jsonl 格式查询 x$ 视图，数据量是未格式化的字节数
+        view = "sys.x$io_global_by_file_by_bytes" if output_format == 'jsonl' else "sys.io_global_by_file_by_bytes"
         cursor.execute(
-            f"select file,count_read,total_read,count_write,total_written,total from sys.io_global_by_file_by_bytes limit {io}")
+            f"select file,count_read,total_read,count_write,total_written,total from {view} limit {io}")
         top_info = cursor.fetchall()
+        records = []
 
         # 创建表格对象
         table = PrettyTable()
@@ -279,21 +475,156 @@ def show_frequently_io(mysql_ip: str, mysql_port: int, mysql_user: str, mysql_pa
 
             # 添加数据到表格中
             table.add_row([wrapped_query, count_read, total_read, count_write, total_written, total])
+            records.append([file, count_read, total_read, count_write, total_written, total])
 
             # 添加数据到表格中
             # table.add_row([file, count_read, total_read, count_write, total_written, total])
 
         # 输出表格
-        print(table)
+        emit_table(table, "frequently_io", ["file", "count_read", "read_bytes", "count_write", "write_bytes",
+                                            "total_bytes"], records)
 
         # 关闭游标和连接
         cursor.close()
         conn.close()
 
 
+def _format_bytes(num):
+    """
+    将字节数格式化为可读的字符串。
+    Args:
+        num: int/float, 字节数
+    Returns:
+        str
+    """
+    for unit in ("B", "KiB", "MiB", "GiB"):
+        if abs(num) < 1024:
+            return "{:.2f} {}".format(num, unit)
+        num /= 1024
+    return "{:.2f} TiB".format(num)
+
+
+def show_frequently_io_delta(mysql_ip: str, mysql_port: int, mysql_user: str, mysql_password: str, io: int,
+                             interval: float):
+    """
+    mysql状态监控工具，按采样间隔统计当前读写量最大的前N个文件。
+    每次采样 performance_schema.file_summary_by_instance 的原始数值列，与上一次快照求差值得到间隔内
+    每个文件的读写字节数和读写次数，遍历时用大小为N的最小堆维护前N个文件。
+    Args:
+        mysql_ip: str, MySQL服务器IP地址
+        mysql_port: int, MySQL服务器端口号
+        mysql_user: str, MySQL用户名
+        mysql_password: str, MySQL用户密码
+        io: int, 显示前N个文件
+        interval: float, 采样间隔（秒）
+    Returns:
+        None
+    """
+
+    # 连接MySQL数据库
+    conn = pymysql.connect(
+        host=mysql_ip,
+        port=mysql_port,
+        user=mysql_user,
+        password=mysql_password,
+        autocommit=True
+    )
+
+    def signal_handler(sig, frame):
+        print('程序被终止')
+        sys.exit(0)
+
+    # 注册信号处理函数
+    signal.signal(signal.SIGINT, signal_handler)  # Ctrl+C
+    signal.signal(signal.SIGTSTP, signal_handler)  # Ctrl+Z
+
+    # 创建游标对象
+    cursor = conn.cursor()
+
+    cursor.execute("SELECT @@performance_schema")
+    if cursor.fetchone()[0] == 0:
+        print("performance_schema参数未开启。")
+        print("在my.cnf配置文件里添加performance_schema=1，并重启mysqld进程生效。")
+        sys.exit(0)
+
+    # 同一个文件被多次打开时有多个实例（OBJECT_INSTANCE_BEGIN不同），按文件名汇总
+    snapshot_sql = ("SELECT FILE_NAME, SUM(COUNT_READ), SUM(SUM_NUMBER_OF_BYTES_READ), "
+                    "SUM(COUNT_WRITE), SUM(SUM_NUMBER_OF_BYTES_WRITE) "
+                    "FROM performance_schema.file_summary_by_instance GROUP BY FILE_NAME")
+
+    def take_snapshot():
+        cursor.execute(snapshot_sql)
+        return {row[0]: (int(row[1]), int(row[2]), int(row[3]), int(row[4])) for row in cursor.fetchall()}
+
+    prev_snapshot = take_snapshot()
+    prev_ts = time.time()
+
+    while True:
+        time.sleep(interval)
+
+        snapshot = take_snapshot()
+        now = time.time()
+        elapsed = now - prev_ts
+
+        # 大小为N的最小堆，堆顶是当前前N个里读写量最小的文件
+        heap = []
+        active_files = 0
+        for file_name, current in snapshot.items():
+            prev = prev_snapshot.get(file_name)
+            # 文件的某个实例被关闭或统计被清空时，以当前值作为增量
+            if prev is None or any(c < p for c, p in zip(current, prev)):
+                prev = (0, 0, 0, 0)
+            count_read = current[0] - prev[0]
+            bytes_read = current[1] - prev[1]
+            count_write = current[2] - prev[2]
+            bytes_write = current[3] - prev[3]
+            total = bytes_read + bytes_write
+            if total <= 0 and count_read + count_write <= 0:
+                continue
+            active_files += 1
+
+            item = (total, file_name, count_read, bytes_read, count_write, bytes_write)
+            if len(heap) < io:
+                heapq.heappush(heap, item)
+            elif item > heap[0]:
+                heapq.heapreplace(heap, item)
+
+        prev_snapshot = snapshot
+        prev_ts = now
+
+        # 创建表格对象
+        table = PrettyTable()
+        table.field_names = ["表文件名", "间隔内读取次数", "每秒读取量", "间隔内写入次数", "每秒写入量", "每秒读写量"]
+
+        # 设置每列的对齐方式为左对齐
+        table.align = "l"
+
+        records = []
+        for total, file_name, count_read, bytes_read, count_write, bytes_write in sorted(heap, reverse=True):
+            # 处理自动换行
+            wrapped_file = '\n'.join(textwrap.wrap(str(file_name), width=70))
+
+            table.add_row([wrapped_file, count_read, _format_bytes(bytes_read / elapsed) + "/s", count_write,
+                           _format_bytes(bytes_write / elapsed) + "/s", _format_bytes(total / elapsed) + "/s"])
+            records.append([file_name, count_read, bytes_read / elapsed, count_write, bytes_write / elapsed,
+                            total / elapsed])
+
+        # 清空控制台
+        print("\033c", end="")
+
+        print(f"采样时间：{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}  采样间隔：{elapsed:.1f}秒  "
+              f"有读写的文件数量：{active_files}")
+        emit_table(table, "frequently_io_delta", ["file", "count_read", "read_bytes_per_sec", "count_write",
+                                                  "write_bytes_per_sec", "total_bytes_per_sec"], records)
+
+        # 输出表格后立即清空缓冲区
+        sys.stdout.flush()
+
+
 def show_lock_sql(mysql_ip: str, mysql_port: int, mysql_user: str, mysql_password: str):
     """
     mysql状态监控工具，查看当前锁阻塞的SQL。
+    存在锁等待时构建完整的等待图，按传递阻塞的会话数量列出阻塞源；没有锁等待时列出所有未提交的事务。
     Args:
         mysql_ip: str, MySQL服务器IP地址
         mysql_port: int, MySQL服务器端口号
@@ -340,48 +671,151 @@ def show_lock_sql(mysql_ip: str, mysql_port: int, mysql_user: str, mysql_passwor
     )
     lock_info = cursor.fetchall()
 
-    # 创建表格对象
-    table = PrettyTable()
-    table.field_names = ["事务ID", "事务状态", "执行时间", "线程ID", "info", "user", "host", "db", "command", "state",
-                         "kill阻塞查询ID"]
+    # 获取锁等待关系：MySQL 8.0 使用 performance_schema.data_lock_waits，低版本使用 sys.innodb_lock_waits
+    try:
+        cursor.execute(
+            "SELECT DISTINCT REQUESTING_ENGINE_TRANSACTION_ID, BLOCKING_ENGINE_TRANSACTION_ID "
+            "FROM performance_schema.data_lock_waits")
+    except pymysql.Error:
+        cursor.execute("SELECT DISTINCT waiting_trx_id, blocking_trx_id FROM sys.innodb_lock_waits")
+    lock_waits = cursor.fetchall()
 
-    # 设置每列的对齐方式为左对齐
-    table.align = "l"
+    if lock_waits:
+        roots = _rank_root_blockers(lock_waits)
+        trx_info = {str(row[0]): row for row in lock_info}
 
-    for row in lock_info:
-        trx_id = row[0]
-        trx_state = row[1]
-        trx_started = row[2]
-        processlist_id = row[3]
-        info = row[4]
-        user = row[5]
-        host = row[6]
-        db = row[7]
-        command = row[8]
-        state = row[9]
-        sql_kill_blocking_query = row[10]
+        # 创建表格对象
+        table = PrettyTable()
+        table.field_names = ["阻塞源事务ID", "事务状态", "事务开始时间", "线程ID", "info", "user", "host", "db", "command",
+                             "直接阻塞数", "累计阻塞数", "kill阻塞源"]
 
-        # 处理自动换行
-        wrapped_trx_started  = '\n'.join(textwrap.wrap(str(trx_started), width=15))
-        wrapped_info = '\n'.join(textwrap.wrap(str(info), width=20))
-        wrapped_host = '\n'.join(textwrap.wrap(str(host), width=10))
-        wrapped_state = '\n'.join(textwrap.wrap(str(state), width=10))
+        # 设置每列的对齐方式为左对齐
+        table.align = "l"
 
-        # 添加数据到表格中
-        table.add_row([trx_id, trx_state, wrapped_trx_started, processlist_id, info, user, wrapped_host, db, command, wrapped_state,
-                       sql_kill_blocking_query])
+        records = []
+        for trx_id, direct, total in roots:
+            row = trx_info.get(trx_id)
+            if row is None:
+                # 阻塞源事务已经结束或不在INNODB_TRX中
+                table.add_row([trx_id, None, None, None, None, None, None, None, None, direct, total, None])
+                records.append([trx_id, None, None, None, None, None, None, None, None, direct, total, None])
+                continue
 
-    # 输出表格
-    print(table)
+            # 处理自动换行
+            wrapped_trx_started = '\n'.join(textwrap.wrap(str(row[2]), width=15))
+            wrapped_info = '\n'.join(textwrap.wrap(str(row[4]), width=20))
+            wrapped_host = '\n'.join(textwrap.wrap(str(row[6]), width=10))
+
+            # 阻塞源通常是未提交的空闲事务，KILL QUERY 无效，需要 KILL 连接
+            table.add_row([trx_id, row[1], wrapped_trx_started, row[3], wrapped_info, row[5], wrapped_host, row[7],
+                           row[8], direct, total, f"KILL {row[3]}"])
+            records.append([trx_id, row[1], row[2], row[3], row[4], row[5], row[6], row[7], row[8], direct, total,
+                            f"KILL {row[3]}"])
+
+        waiting = len({str(waiting_trx_id) for waiting_trx_id, _ in lock_waits})
+        print(f"锁等待事务数量：{waiting}  阻塞源数量：{len(roots)}")
+
+        # 输出表格
+        emit_table(table, "lock_root_blockers", ["trx_id", "trx_state", "trx_started", "thread_id", "info", "user",
+                                                 "host", "db", "command", "direct_blocked", "total_blocked",
+                                                 "kill_sql"], records)
+    else:
+        # 创建表格对象
+        table = PrettyTable()
+        table.field_names = ["事务ID", "事务状态", "执行时间", "线程ID", "info", "user", "host", "db", "command", "state",
+                             "kill阻塞查询ID"]
+
+        # 设置每列的对齐方式为左对齐
+        table.align = "l"
+
+        records = []
+        for row in lock_info:
+            trx_id = row[0]
+            trx_state = row[1]
+            trx_started = row[2]
+            processlist_id = row[3]
+            info = row[4]
+            user = row[5]
+            host = row[6]
+            db = row[7]
+            command = row[8]
+            state = row[9]
+            sql_kill_blocking_query = row[10]
+
+            # 处理自动换行
+            wrapped_trx_started  = '\n'.join(textwrap.wrap(str(trx_started), width=15))
+            wrapped_info = '\n'.join(textwrap.wrap(str(info), width=20))
+            wrapped_host = '\n'.join(textwrap.wrap(str(host), width=10))
+            wrapped_state = '\n'.join(textwrap.wrap(str(state), width=10))
+
+            # 添加数据到表格中
+            table.add_row([trx_id, trx_state, wrapped_trx_started, processlist_id, info, user, wrapped_host, db, command, wrapped_state,
+                           sql_kill_blocking_query])
+            records.append(list(row[:11]))
+
+        # 输出表格
+        emit_table(table, "lock_waits", ["trx_id", "trx_state", "trx_started", "thread_id", "info", "user", "host",
+                                         "db", "command", "state", "kill_sql"], records)
 
     # 关闭游标和连接
     cursor.close()
     conn.close()
 
 
+def _rank_root_blockers(lock_waits):
+    """
+    根据锁等待关系构建等待图，找出阻塞源（只阻塞别人、自身不在等待的事务）以及不被阻塞源阻塞的
+    等待环上的事务，并统计每个阻塞源直接和间接阻塞的事务数量。
+    Args:
+        lock_waits: list, [(等待事务ID, 阻塞事务ID), ...]
+    Returns:
+        list, [(阻塞源事务ID, 直接阻塞数, 累计阻塞数), ...]，按累计阻塞数降序
+    """
+    blocked_by = {}
+    waiting = set()
+    for waiting_trx_id, blocking_trx_id in lock_waits:
+        waiting_trx_id = str(waiting_trx_id)
+        blocking_trx_id = str(blocking_trx_id)
+        blocked_by.setdefault(blocking_trx_id, set()).add(waiting_trx_id)
+        waiting.add(waiting_trx_id)
+
+    def reachable(root):
+        # 广度优先遍历统计传递阻塞的事务，root 在环上时结果中也包含它自己
+        visited = set()
+        queue = deque([root])
+        while queue:
+            for waiter in blocked_by.get(queue.popleft(), ()):
+                if waiter not in visited:
+                    visited.add(waiter)
+                    queue.append(waiter)
+        return visited
+
+    ranked = []
+    covered = set()
+    for root in blocked_by:
+        if root in waiting:
+            continue
+        visited = reachable(root)
+        covered |= visited
+        ranked.append((root, len(blocked_by[root]), len(visited)))
+
+    # 真正的阻塞源到达不了的阻塞者位于等待环上（死锁检测前的瞬间），环上的事务也作为阻塞源列出
+    for trx_id in blocked_by:
+        if trx_id in covered or trx_id not in waiting:
+            continue
+        visited = reachable(trx_id)
+        if trx_id in visited:
+            ranked.append((trx_id, len(blocked_by[trx_id]), len(visited - {trx_id})))
+
+    ranked.sort(key=lambda x: (x[2], x[1]), reverse=True)
+    return ranked
+
+
 def show_redundant_indexes(mysql_ip: str, mysql_port: int, mysql_user: str, mysql_password: str):
     """
-    mysql状态监控工具，查看重复或冗余的索引。
+    mysql状态监控工具，查看重复或冗余的索引，以及自实例启动以来没有被读取过的索引。
+    每个候选索引关联 mysql.innodb_index_stats 中的索引大小和 performance_schema 中的读写次数，
+    按删除后节省的空间和减少的写入次数排序。
     Args:
         mysql_ip: str, MySQL服务器IP地址
         mysql_port: int, MySQL服务器端口号
@@ -403,8 +837,8 @@ def show_redundant_indexes(mysql_ip: str, mysql_port: int, mysql_user: str, mysq
     cursor = conn.cursor()
 
     # 获取数据库的初始统计信息
-    cursor.execute("SELECT @@performance_schema")
-    is_performance_schema = cursor.fetchone()
+    cursor.execute("SELECT @@performance_schema, @@innodb_page_size")
+    is_performance_schema, page_size = cursor.fetchone()
 
     if is_performance_schema == 0:
         print("performance_schema参数未开启。")
@@ -416,29 +850,98 @@ def show_redundant_indexes(mysql_ip: str, mysql_port: int, mysql_user: str, mysq
             "select table_schema,table_name,redundant_index_name,redundant_index_columns,sql_drop_index from sys.schema_redundant_indexes")
         redundant_info = cursor.fetchall()
 
+        # 索引占用的空间：innodb_index_stats 中 stat_name='size' 是索引的页数，分区表按分区累加
+        cursor.execute("SELECT database_name, table_name, index_name, stat_value FROM mysql.innodb_index_stats "
+                       "WHERE stat_name = 'size'")
+        index_size = {}
+        for database_name, stats_table_name, index_name, pages in cursor.fetchall():
+            key = (database_name, re.split(r'#p#', stats_table_name, flags=re.IGNORECASE)[0], index_name)
+            index_size[key] = index_size.get(key, 0) + int(pages) * int(page_size)
+
+        # 索引自实例启动以来的读写次数
+        cursor.execute("SELECT OBJECT_SCHEMA, OBJECT_NAME, INDEX_NAME, COUNT_READ, COUNT_WRITE "
+                       "FROM performance_schema.table_io_waits_summary_by_index_usage "
+                       "WHERE INDEX_NAME IS NOT NULL "
+                       "AND OBJECT_SCHEMA NOT IN ('mysql', 'information_schema', 'performance_schema', 'sys')")
+        index_usage = {(row[0], row[1], row[2]): (int(row[3]), int(row[4])) for row in cursor.fetchall()}
+
+        # 唯一索引承担约束作用，即使没有读取也不能直接删除
+        cursor.execute("SELECT DISTINCT TABLE_SCHEMA, TABLE_NAME, INDEX_NAME FROM information_schema.STATISTICS "
+                       "WHERE NON_UNIQUE = 0 "
+                       "AND TABLE_SCHEMA NOT IN ('mysql', 'information_schema', 'performance_schema', 'sys')")
+        unique_indexes = {(row[0], row[1], row[2]) for row in cursor.fetchall()}
+
+        cursor.execute("SHOW GLOBAL STATUS LIKE 'Uptime'")
+        uptime = int(cursor.fetchone()[1])
+
+        redundant_keys = set()
+        redundant_rows = []
+        for table_schema, table_name, redundant_index_name, redundant_index_columns, sql_drop_index in redundant_info:
+            key = (table_schema, table_name, redundant_index_name)
+            redundant_keys.add(key)
+            count_read, count_write = index_usage.get(key, (None, None))
+            redundant_rows.append((index_size.get(key, 0), count_write or 0, table_schema, table_name,
+                                   redundant_index_name, redundant_index_columns, count_read, count_write,
+                                   sql_drop_index))
+
+        # 按节省的空间和减少的写放大排序
+        redundant_rows.sort(key=lambda x: (x[0], x[1]), reverse=True)
+
         # 创建表格对象
         table = PrettyTable()
-        table.field_names = ["数据库名", "表名", "冗余索引名", "冗余索引列名", "删除冗余索引SQL"]
+        table.field_names = ["数据库名", "表名", "冗余索引名", "冗余索引列名", "索引大小", "读取次数", "写入次数", "删除冗余索引SQL"]
 
         # 设置每列的对齐方式为左对齐
         table.align = "l"
 
-        for row in redundant_info:
-            table_schema = row[0]
-            table_name = row[1]
-            redundant_index_name = row[2]
-            redundant_index_columns = row[3]
-            sql_drop_index = row[4]
-
-            # 处理自动换行
-            # wrapped_query = '\n'.join(textwrap.wrap(query, width=70))
+        total_size = 0
+        records = []
+        for size, _, table_schema, table_name, index_name, index_columns, count_read, count_write, sql_drop_index \
+                in redundant_rows:
+            total_size += size
 
             # 添加数据到表格中
-            table.add_row([table_schema, table_name, redundant_index_name, redundant_index_columns, sql_drop_index])
-            # table.add_row([wrapped_query, db, last_seen, exec_count, max_latency, avg_latency])
+            table.add_row([table_schema, table_name, index_name, index_columns, _format_bytes(size), count_read,
+                           count_write, sql_drop_index])
+            records.append([table_schema, table_name, index_name, index_columns, size, count_read, count_write,
+                            sql_drop_index])
+
+        print(f"冗余索引：{len(redundant_rows)} 个，删除后预计节省空间：{_format_bytes(total_size)}")
 
         # 输出表格
-        print(table)
+        emit_table(table, "redundant_indexes", ["schema", "table", "index_name", "index_columns", "size_bytes",
+                                                "count_read", "count_write", "drop_sql"], records)
+
+        # 第二类：自实例启动以来没有被读取过的非唯一索引
+        unused_rows = []
+        for key, (count_read, count_write) in index_usage.items():
+            if count_read != 0 or key[2] == 'PRIMARY' or key in unique_indexes or key in redundant_keys:
+                continue
+            unused_rows.append((index_size.get(key, 0), count_write, key))
+        unused_rows.sort(key=lambda x: (x[0], x[1]), reverse=True)
+
+        # 创建表格对象
+        table = PrettyTable()
+        table.field_names = ["数据库名", "表名", "未使用索引名", "索引大小", "写入次数", "删除索引SQL"]
+
+        # 设置每列的对齐方式为左对齐
+        table.align = "l"
+
+        total_size = 0
+        records = []
+        for size, count_write, (table_schema, table_name, index_name) in unused_rows:
+            total_size += size
+            drop_sql = f"ALTER TABLE `{table_schema}`.`{table_name}` DROP INDEX `{index_name}`"
+            table.add_row([table_schema, table_name, index_name, _format_bytes(size), count_write, drop_sql])
+            records.append([table_schema, table_name, index_name, size, count_write, drop_sql])
+
+        started = datetime.fromtimestamp(time.time() - uptime).strftime('%Y-%m-%d %H:%M:%S')
+        print(f"\n未使用索引：{len(unused_rows)} 个，删除后预计节省空间：{_format_bytes(total_size)}"
+              f"（统计起始于 {started}）")
+
+        # 输出表格
+        emit_table(table, "unused_indexes", ["schema", "table", "index_name", "size_bytes", "count_write",
+                                             "drop_sql"], records)
 
         # 关闭游标和连接
         cursor.close()
@@ -490,13 +993,124 @@ def show_conn_count(mysql_ip: str, mysql_port: int, mysql_user: str, mysql_passw
         table.add_row([user, db, Client_IP, count])
 
     # 输出表格
-    print(table)
+    emit_table(table, "conn_count", ["user", "db", "client_ip", "count"], [list(row) for row in conn_info])
 
     # 关闭游标和连接
     cursor.close()
     conn.close()
 
 
+def show_conn_count_trend(mysql_ip: str, mysql_port: int, mysql_user: str, mysql_password: str, interval: float):
+    """
+    mysql状态监控工具，按 (用户, 数据库, 应用端IP) 持续采样连接数，找出连接数持续上涨的应用端。
+    采样 performance_schema.threads 而不是 information_schema.PROCESSLIST，避免低版本上的全局锁。
+    Args:
+        mysql_ip: str, MySQL服务器IP地址
+        mysql_port: int, MySQL服务器端口号
+        mysql_user: str, MySQL用户名
+        mysql_password: str, MySQL用户密码
+        interval: float, 采样间隔（秒）
+    Returns:
+        None
+    """
+
+    WINDOW = 30   # 每个分组保留最近30次采样用于拟合趋势
+    TOP = 30      # 最多显示30个分组
+
+    # 连接MySQL数据库
+    conn = pymysql.connect(
+        host=mysql_ip,
+        port=mysql_port,
+        user=mysql_user,
+        password=mysql_password,
+        autocommit=True
+    )
+
+    def signal_handler(sig, frame):
+        print('程序被终止')
+        sys.exit(0)
+
+    # 注册信号处理函数
+    signal.signal(signal.SIGINT, signal_handler)  # Ctrl+C
+    signal.signal(signal.SIGTSTP, signal_handler)  # Ctrl+Z
+
+    # 创建游标对象
+    cursor = conn.cursor()
+
+    cursor.execute("SELECT @@performance_schema, @@max_connections")
+    is_performance_schema, max_conn = cursor.fetchone()
+    if is_performance_schema == 0:
+        print("performance_schema参数未开启。")
+        print("在my.cnf配置文件里添加performance_schema=1，并重启mysqld进程生效。")
+        sys.exit(0)
+
+    # (用户, 数据库, 应用端IP) -> deque([(采样时间, 连接数), ...])
+    history = {}
+    total_history = deque(maxlen=WINDOW)
+
+    while True:
+        sample_ts = time.time()
+
+        cursor.execute(
+            "SELECT PROCESSLIST_USER, PROCESSLIST_DB, PROCESSLIST_HOST, COUNT(*) FROM performance_schema.threads "
+            "WHERE TYPE = 'FOREGROUND' AND PROCESSLIST_ID IS NOT NULL "
+            "GROUP BY PROCESSLIST_USER, PROCESSLIST_DB, PROCESSLIST_HOST")
+        counts = {(row[0], row[1], row[2]): int(row[3]) for row in cursor.fetchall()}
+
+        # 本次没有出现的分组记为0，连接数归零之后就不再跟踪
+        for key in list(history):
+            if key not in counts:
+                if history[key][-1][1] == 0:
+                    del history[key]
+                else:
+                    history[key].append((sample_ts, 0))
+        for key, count in counts.items():
+            history.setdefault(key, deque(maxlen=WINDOW)).append((sample_ts, count))
+
+        total = sum(counts.values())
+        total_history.append((sample_ts, total))
+
+        trends = []
+        for key, points in history.items():
+            rate = _fit_growth_rate(points)
+            previous = points[-2][1] if len(points) > 1 else points[-1][1]
+            trends.append(((rate or 0) * 60, key, points[-1][1], points[-1][1] - previous, points[0][1]))
+
+        top_items = heapq.nlargest(TOP, trends, key=lambda x: (x[0], x[2]))
+
+        # 创建表格对象
+        table = PrettyTable()
+        table.field_names = ["连接用户", "数据库名", "应用端IP", "当前数量", "较上次变化", "窗口起始数量", "趋势(个/分钟)"]
+
+        # 设置每列的对齐方式为左对齐
+        table.align = "l"
+
+        records = []
+        for rate_per_minute, (user, db, client_ip), count, delta, first in top_items:
+            table.add_row([user, db, client_ip, count, "{:+d}".format(delta), first, "{:+.1f}".format(rate_per_minute)])
+            records.append([user, db, client_ip, count, delta, first, rate_per_minute])
+
+        # 按总连接数的增长趋势估算多久会达到 max_connections
+        total_rate = _fit_growth_rate(total_history)
+        if total_rate and total_rate > 0:
+            eta = "约{:.1f}分钟".format((int(max_conn) - total) / total_rate / 60)
+        else:
+            eta = "无上涨趋势"
+
+        # 清空控制台
+        print("\033c", end="")
+
+        print(f"采样时间：{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}  总连接数：{total}/{max_conn}  "
+              f"预计达到max_connections：{eta}")
+        emit_table(table, "conn_trend", ["user", "db", "client_ip", "count", "delta", "window_start_count",
+                                         "trend_per_minute"], records)
+
+        # 输出表格后立即清空缓冲区
+        sys.stdout.flush()
+
+        time.sleep(interval)
+
+
 def show_table_info(mysql_ip: str, mysql_port: int, mysql_user: str, mysql_password: str):
     """
     mysql状态监控工具，统计库里每个表的大小。
@@ -545,8 +1159,7 @@ def show_table_info(mysql_ip: str, mysql_port: int, mysql_user: str, mysql_passw
     # 设置每列的对齐方式为左对齐
     table.align = "l"
 
-    RESIDUAL_AUTO_INCREMENT = 0
-
+    records = []
     for row in conn_info:
         TABLE_SCHEMA = row[0]
         TABLE_NAME = row[1]
@@ -560,17 +1173,11 @@ def show_table_info(mysql_ip: str, mysql_port: int, mysql_user: str, mysql_passw
         AUTO_INCREMENT = row[9]
         IS_SIGNED = row[10]
 
-        if DATA_TYPE == 'int':
-            if IS_SIGNED == 0:
-                RESIDUAL_AUTO_INCREMENT = int(4294967295 - AUTO_INCREMENT)
-            if IS_SIGNED == 1:
-                RESIDUAL_AUTO_INCREMENT = int(2147483647 - AUTO_INCREMENT)
-
-        if DATA_TYPE == 'bigint':
-            if IS_SIGNED == 0:
-                RESIDUAL_AUTO_INCREMENT = Decimal("18446744073709551615") - Decimal(AUTO_INCREMENT)
-            if IS_SIGNED == 1:
-                RESIDUAL_AUTO_INCREMENT = Decimal("9223372036854775807") - Decimal(AUTO_INCREMENT)
+        # 支持 tinyint/smallint/mediumint/int/bigint 所有整数类型
+        RESIDUAL_AUTO_INCREMENT = None
+        if DATA_TYPE in INTEGER_TYPE_MAX and AUTO_INCREMENT is not None:
+            max_value = INTEGER_TYPE_MAX[DATA_TYPE][0 if IS_SIGNED == 1 else 1]
+            RESIDUAL_AUTO_INCREMENT = max_value - int(AUTO_INCREMENT)
 
         # 处理自动换行
         wrapped_TABLE_NAME = '\n'.join(textwrap.wrap(str(TABLE_NAME), width=20))
@@ -581,15 +1188,236 @@ def show_table_info(mysql_ip: str, mysql_port: int, mysql_user: str, mysql_passw
         # 添加数据到表格中
         table.add_row([TABLE_SCHEMA, wrapped_TABLE_NAME, ENGINE, DATA_LENGTH, INDEX_LENGTH, TOTAL_LENGTH,
                        COLUMN_NAME, wrapped_COLUMN_TYPE, wrapped_AUTO_INCREMENT, wrapped_RESIDUAL_AUTO_INCREMENT])
+        records.append([TABLE_SCHEMA, TABLE_NAME, ENGINE, row[3], row[4], row[5], COLUMN_NAME, COLUMN_TYPE,
+                        AUTO_INCREMENT, RESIDUAL_AUTO_INCREMENT])
 
     # 输出表格
-    print(table)
+    emit_table(table, "table_info", ["schema", "table", "engine", "data_gb", "index_gb", "total_gb",
+                                     "auto_increment_column", "column_type", "auto_increment", "auto_increment_left"],
+               records)
 
     # 关闭游标和连接
     cursor.close()
     conn.close()
 
 
+def _fit_growth_rate(samples):
+    """
+    用最小二乘法拟合自增值的增长速率。
+    Args:
+        samples: list, [(采样时间戳, 自增值), ...]
+    Returns:
+        float, 每秒增长量；样本不足时返回None
+    """
+    n = len(samples)
+    if n < 2:
+        return None
+
+    mean_t = sum(t for t, _ in samples) / n
+    mean_v = sum(v for _, v in samples) / n
+    var_t = sum((t - mean_t) ** 2 for t, _ in samples)
+    if var_t == 0:
+        return None
+
+    return sum((t - mean_t) * (v - mean_v) for t, v in samples) / var_t
+
+
+def show_auto_increment_forecast(mysql_ip: str, mysql_port: int, mysql_user: str, mysql_password: str,
+                                 interval: float, history_file: str = None):
+    """
+    mysql状态监控工具，周期采样所有表的AUTO_INCREMENT值，拟合增长速率并按预计耗尽天数排序。
+    首次采样和每隔FULL_SCAN_EVERY次采样做一次全量扫描（获取自增字段类型），其余采样只拉取
+    UPDATE_TIME有变化的表。采样历史追加写入本地文件，重启后自动加载继续拟合；文件行数超过
+    保留的采样点数两倍时按内存中的历史重写，避免文件无限增长。
+    Args:
+        mysql_ip: str, MySQL服务器IP地址
+        mysql_port: int, MySQL服务器端口号
+        mysql_user: str, MySQL用户名
+        mysql_password: str, MySQL用户密码
+        interval: float, 采样间隔（秒）
+        history_file: str, 采样历史文件，默认 mysqlstat_autoinc_{ip}_{port}.jsonl
+    Returns:
+        None
+    """
+
+    FULL_SCAN_EVERY = 60   # 每60次采样做一次全量扫描，发现新表和DDL变更
+    HISTORY_POINTS = 500   # 每张表在内存中保留的采样点数
+
+    if not history_file:
+        history_file = f"mysqlstat_autoinc_{mysql_ip}_{mysql_port}.jsonl"
+
+    # 连接MySQL数据库
+    conn = pymysql.connect(
+        host=mysql_ip,
+        port=mysql_port,
+        user=mysql_user,
+        password=mysql_password,
+        autocommit=True
+    )
+
+    def signal_handler(sig, frame):
+        print('程序被终止')
+        sys.exit(0)
+
+    # 注册信号处理函数
+    signal.signal(signal.SIGINT, signal_handler)  # Ctrl+C
+    signal.signal(signal.SIGTSTP, signal_handler)  # Ctrl+Z
+
+    # 创建游标对象
+    cursor = conn.cursor()
+
+    # MySQL 8.0 默认缓存information_schema统计信息，需要关闭缓存才能拿到实时的AUTO_INCREMENT
+    try:
+        cursor.execute("SET SESSION information_schema_stats_expiry = 0")
+    except pymysql.Error:
+        pass
+
+    # 每张表的自增字段信息：(schema, table) -> (字段名, 字段类型, 最大值)
+    columns_info = {}
+    # 每张表的采样历史：(schema, table) -> deque([(时间戳, 自增值), ...])
+    history = {}
+
+    def rewrite_history():
+        """只保留每张表最近 HISTORY_POINTS 个采样点，先写临时文件再替换，返回写入的行数"""
+        tmp_file = history_file + ".tmp"
+        lines = 0
+        with open(tmp_file, "w", encoding="utf-8") as f:
+            for (schema, table_name), points in history.items():
+                for ts, auto_increment in points:
+                    f.write(json.dumps({"ts": ts, "schema": schema, "table": table_name,
+                                        "auto_increment": auto_increment}) + "\n")
+                    lines += 1
+        os.replace(tmp_file, history_file)
+        return lines
+
+    # 历史文件当前的行数，超过保留点数的两倍时重写
+    history_lines = 0
+
+    # 加载本地采样历史
+    if os.path.exists(history_file):
+        with open(history_file, encoding="utf-8") as f:
+            for line in f:
+                history_lines += 1
+                try:
+                    item = json.loads(line)
+                except ValueError:
+                    continue
+                key = (item["schema"], item["table"])
+                history.setdefault(key, deque(maxlen=HISTORY_POINTS)).append((item["ts"], item["auto_increment"]))
+        if history_lines > sum(len(points) for points in history.values()):
+            history_lines = rewrite_history()
+
+    full_scan_sql = """
+        SELECT t.TABLE_SCHEMA, t.TABLE_NAME, t.AUTO_INCREMENT, c.COLUMN_NAME, c.DATA_TYPE,
+        locate('unsigned', c.COLUMN_TYPE) = 0 AS IS_SIGNED
+        FROM information_schema.TABLES t JOIN information_schema.COLUMNS c
+        ON t.TABLE_SCHEMA = c.TABLE_SCHEMA AND t.TABLE_NAME = c.TABLE_NAME
+        WHERE c.EXTRA LIKE '%auto_increment%' AND t.AUTO_INCREMENT IS NOT NULL
+        AND t.TABLE_SCHEMA NOT IN ('mysql', 'information_schema', 'performance_schema', 'sys')
+        """
+
+    incremental_sql = """
+        SELECT TABLE_SCHEMA, TABLE_NAME, AUTO_INCREMENT FROM information_schema.TABLES
+        WHERE AUTO_INCREMENT IS NOT NULL AND UPDATE_TIME >= %s
+        AND TABLE_SCHEMA NOT IN ('mysql', 'information_schema', 'performance_schema', 'sys')
+        """
+
+    last_scan_time = None
+    count = 0
+
+    while True:
+        sample_ts = time.time()
+
+        # 以服务器时间作为下一次增量采样的UPDATE_TIME基准
+        cursor.execute("SELECT NOW()")
+        server_now = cursor.fetchone()[0]
+
+        if count % FULL_SCAN_EVERY == 0 or last_scan_time is None:
+            cursor.execute(full_scan_sql)
+            rows = cursor.fetchall()
+            columns_info = {}
+            samples = []
+            for schema, table_name, auto_increment, column_name, data_type, is_signed in rows:
+                if data_type not in INTEGER_TYPE_MAX:
+                    continue
+                key = (schema, table_name)
+                columns_info[key] = (column_name, data_type, INTEGER_TYPE_MAX[data_type][0 if is_signed == 1 else 1])
+                samples.append((key, int(auto_increment)))
+        else:
+            cursor.execute(incremental_sql, (last_scan_time,))
+            samples = [((schema, table_name), int(auto_increment))
+                       for schema, table_name, auto_increment in cursor.fetchall()
+                       if (schema, table_name) in columns_info]
+
+        last_scan_time = server_now
+
+        # 只记录自增值发生变化的表
+        changed = []
+        for key, auto_increment in samples:
+            points = history.setdefault(key, deque(maxlen=HISTORY_POINTS))
+            if not points or points[-1][1] != auto_increment:
+                points.append((sample_ts, auto_increment))
+                changed.append((key, auto_increment))
+
+        if changed:
+            with open(history_file, "a", encoding="utf-8") as f:
+                for (schema, table_name), auto_increment in changed:
+                    f.write(json.dumps({"ts": sample_ts, "schema": schema, "table": table_name,
+                                        "auto_increment": auto_increment}) + "\n")
+            history_lines += len(changed)
+            if history_lines > 2 * sum(len(points) for points in history.values()):
+                history_lines = rewrite_history()
+
+        # 拟合增长速率并计算预计耗尽天数
+        forecast = []
+        for key, (column_name, data_type, max_value) in columns_info.items():
+            points = history.get(key)
+            if not points:
+                continue
+            current = points[-1][1]
+            # 值未变化期间不会写入历史，补一个当前时刻的点，避免高估已经停止增长的表
+            fit_points = list(points)
+            if fit_points[-1][0] < sample_ts:
+                fit_points.append((sample_ts, current))
+            rate = _fit_growth_rate(fit_points)
+            if not rate or rate <= 0:
+                continue
+            days_left = (max_value - current) / rate / 86400
+            forecast.append((days_left, key, column_name, data_type, current, max_value, rate))
+
+        forecast.sort(key=lambda x: x[0])
+
+        # 创建表格对象
+        table = PrettyTable()
+        table.field_names = ["库名", "表名", "自增字段", "字段类型", "自增当前值", "已使用(%)", "日增长量", "预计耗尽天数"]
+
+        # 设置每列的对齐方式为左对齐
+        table.align = "l"
+
+        records = []
+        for days_left, (schema, table_name), column_name, data_type, current, max_value, rate in forecast:
+            records.append([schema, table_name, column_name, data_type, current, max_value,
+                            current * 100 / max_value, rate * 86400, days_left])
+            wrapped_table_name = '\n'.join(textwrap.wrap(str(table_name), width=20))
+            table.add_row([schema, wrapped_table_name, column_name, data_type, current,
+                           "{:.2f}".format(current * 100 / max_value), "{:.0f}".format(rate * 86400),
+                           "{:.1f}".format(days_left)])
+
+        # 清空控制台
+        print("\033c", end="")
+
+        print(f"采样时间：{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}  已采样表数量：{len(columns_info)}  "
+              f"本次变化表数量：{len(changed)}  采样历史文件：{history_file}")
+        emit_table(table, "autoinc_forecast", ["schema", "table", "column", "data_type", "auto_increment",
+                                               "max_value", "used_percent", "growth_per_day", "days_left"], records)
+
+        # 输出表格后立即清空缓冲区
+        sys.stdout.flush()
+
+        count += 1
+        time.sleep(interval)
+
+
 def show_deadlock_info(mysql_ip: str, mysql_port: int, mysql_user: str, mysql_password: str):
     """
     mysql状态监控工具，查看死锁信息。
@@ -620,7 +1448,9 @@ def show_deadlock_info(mysql_ip: str, mysql_port: int, mysql_user: str, mysql_pa
 
     deadlock_info = re.search(r"LATEST DETECTED DEADLOCK.*?WE ROLL BACK TRANSACTION\s+\(\d+\)",
                               innodb_status, re.DOTALL)
-    if deadlock_info:
+    if deadlock_info and output_format == 'jsonl':
+        emit_rows("deadlock", DEADLOCK_FIELDS, [_deadlock_row(_parse_deadlock(deadlock_info.group(0)))])
+    elif deadlock_info:
         print("------------------------")
         print(deadlock_info.group(0))
         print("------------------------")
@@ -630,7 +1460,300 @@ def show_deadlock_info(mysql_ip: str, mysql_port: int, mysql_user: str, mysql_pa
     conn.close()
 
 
-def analyze_binlog(mysql_ip: str, mysql_port: int, mysql_user: str, mysql_password: str, binlog_list: list):
+# jsonl 格式的 deadlock 记录字段，transactions 为 _parse_deadlock 解析出的事务列表
+DEADLOCK_FIELDS = ["deadlock_time", "victim", "transactions"]
+
+
+def _deadlock_row(record: dict):
+    return [record["time"], record["victim"], record["transactions"]]
+
+
+def _parse_deadlock(deadlock_text: str):
+    """
+    将 SHOW ENGINE INNODB STATUS 中的 LATEST DETECTED DEADLOCK 段落解析为结构化记录。
+    Args:
+        deadlock_text: str, 死锁段落文本
+    Returns:
+        dict, {"time", "victim", "transactions": [{"no", "trx_id", "thread_id", "client", "query", "locks"}]}
+    """
+    record = {"time": None, "victim": None, "transactions": []}
+
+    time_match = re.search(r"LATEST DETECTED DEADLOCK\s*\n-+\n(\S+ \S+)", deadlock_text)
+    if time_match:
+        record["time"] = time_match.group(1)
+
+    trx = None
+    lock_kind = None
+    reading_query = False
+
+    for line in deadlock_text.splitlines():
+        header = re.match(r"\*\*\* \((\d+)\) (TRANSACTION|HOLDS THE LOCK|WAITING FOR THIS LOCK)", line)
+        if header:
+            reading_query = False
+            if header.group(2) == "TRANSACTION":
+                trx = {"no": int(header.group(1)), "trx_id": None, "thread_id": None, "client": None,
+                       "query": [], "locks": []}
+                record["transactions"].append(trx)
+                lock_kind = None
+            else:
+                lock_kind = "holds" if header.group(2) == "HOLDS THE LOCK" else "waits"
+            continue
+
+        victim = re.match(r"\*\*\* WE ROLL BACK TRANSACTION \((\d+)\)", line)
+        if victim:
+            record["victim"] = int(victim.group(1))
+            break
+
+        if trx is None:
+            continue
+
+        trx_match = re.match(r"TRANSACTION (\d+), ", line)
+        if trx_match and trx["trx_id"] is None:
+            trx["trx_id"] = trx_match.group(1)
+            continue
+
+        thread_match = re.match(r"MySQL thread id (\d+), OS thread handle \S+, query id \d+ ?(.*)", line)
+        if thread_match:
+            trx["thread_id"] = int(thread_match.group(1))
+            trx["client"] = thread_match.group(2)
+            reading_query = True
+            continue
+
+        record_lock = re.match(r"RECORD LOCKS .*?index (\S+) of table (\S+) trx id \d+ (lock[_ ]mode .*)$", line)
+        table_lock = re.match(r"TABLE LOCK table (\S+) trx id \d+ (lock mode .*)$", line)
+        if record_lock or table_lock:
+            reading_query = False
+            if record_lock:
+                index_name, table_name, lock_mode = record_lock.groups()
+            else:
+                index_name = None
+                table_name, lock_mode = table_lock.groups()
+            trx["locks"].append({"kind": lock_kind, "table": table_name, "index": index_name,
+                                 "lock_mode": lock_mode.strip()})
+            continue
+
+        if reading_query:
+            trx["query"].append(line)
+
+    for trx in record["transactions"]:
+        trx["query"] = "\n".join(trx["query"]).strip()
+
+    return record
+
+
+def watch_deadlock_info(mysql_ip: str, mysql_port: int, mysql_user: str, mysql_password: str, interval: float,
+                        history_file: str = None):
+    """
+    mysql状态监控工具，持续捕获死锁信息。
+    每次轮询先读取 INNODB_METRICS 的 lock_deadlocks 计数器，计数变化时才拉取 SHOW ENGINE INNODB STATUS，
+    死锁段落的内容哈希变化时才重新解析。解析后的死锁记录追加写入本地日志，并按表汇总死锁次数。
+    Args:
+        mysql_ip: str, MySQL服务器IP地址
+        mysql_port: int, MySQL服务器端口号
+        mysql_user: str, MySQL用户名
+        mysql_password: str, MySQL用户密码
+        interval: float, 轮询间隔（秒）
+        history_file: str, 死锁日志文件，默认 mysqlstat_deadlock_{ip}_{port}.jsonl
+    Returns:
+        None
+    """
+
+    if not history_file:
+        history_file = f"mysqlstat_deadlock_{mysql_ip}_{mysql_port}.jsonl"
+
+    # 连接MySQL数据库
+    conn = pymysql.connect(
+        host=mysql_ip,
+        port=mysql_port,
+        user=mysql_user,
+        password=mysql_password,
+        autocommit=True
+    )
+
+    def signal_handler(sig, frame):
+        print('程序被终止')
+        sys.exit(0)
+
+    # 注册信号处理函数
+    signal.signal(signal.SIGINT, signal_handler)  # Ctrl+C
+    signal.signal(signal.SIGTSTP, signal_handler)  # Ctrl+Z
+
+    # 创建游标对象
+    cursor = conn.cursor()
+
+    # 按表汇总：表名 -> {"count": 死锁次数, "last_time": 最近发生时间, "indexes": 涉及的索引}
+    table_stats = {}
+    last_hash = None
+
+    def aggregate(record):
+        tables = {}
+        for trx in record["transactions"]:
+            for lock in trx["locks"]:
+                tables.setdefault(lock["table"], set()).add(lock["index"] or "-")
+        for table_name, indexes in tables.items():
+            stats = table_stats.setdefault(table_name, {"count": 0, "last_time": None, "indexes": set()})
+            stats["count"] += 1
+            stats["last_time"] = record["time"]
+            stats["indexes"].update(indexes)
+
+    # 加载本地死锁日志，继续累计
+    if os.path.exists(history_file):
+        with open(history_file, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                aggregate(record)
+                last_hash = record.get("hash")
+
+    # lock_deadlocks 计数器在 5.6 及以上默认开启，查询失败或未开启时每次都读取 INNODB STATUS
+    def read_deadlock_counter():
+        try:
+            cursor.execute("SELECT COUNT, STATUS FROM information_schema.INNODB_METRICS WHERE NAME = 'lock_deadlocks'")
+            row = cursor.fetchone()
+        except pymysql.Error:
+            return None
+        if not row or row[1] != 'enabled':
+            return None
+        return row[0]
+
+    last_counter = None
+
+    while True:
+        counter = read_deadlock_counter()
+
+        if counter is None or counter != last_counter:
+            last_counter = counter
+
+            cursor.execute("SHOW ENGINE INNODB STATUS")
+            innodb_status = cursor.fetchall()[0][2]
+
+            deadlock_info = re.search(r"LATEST DETECTED DEADLOCK.*?WE ROLL BACK TRANSACTION\s+\(\d+\)",
+                                      innodb_status, re.DOTALL)
+            if deadlock_info:
+                deadlock_text = deadlock_info.group(0)
+                deadlock_hash = hashlib.md5(deadlock_text.encode("utf-8")).hexdigest()
+
+                if deadlock_hash != last_hash:
+                    last_hash = deadlock_hash
+
+                    record = _parse_deadlock(deadlock_text)
+                    record["hash"] = deadlock_hash
+                    aggregate(record)
+
+                    with open(history_file, "a", encoding="utf-8") as f:
+                        f.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+                    # 创建表格对象
+                    table = PrettyTable()
+                    table.field_names = ["表名", "死锁次数", "最近发生时间", "涉及索引"]
+
+                    # 设置每列的对齐方式为左对齐
+                    table.align = "l"
+
+                    records = []
+                    for table_name, stats in sorted(table_stats.items(), key=lambda x: x[1]["count"], reverse=True):
+                        table.add_row([table_name, stats["count"], stats["last_time"],
+                                       '\n'.join(textwrap.wrap(', '.join(sorted(stats["indexes"])), width=40))])
+                        records.append([table_name, stats["count"], stats["last_time"], sorted(stats["indexes"])])
+
+                    if output_format == 'jsonl':
+                        emit_rows("deadlock", DEADLOCK_FIELDS, [_deadlock_row(record)])
+                    print("------------------------")
+                    print(f"捕获到新的死锁，发生时间：{record['time']}，回滚事务：({record['victim']})")
+                    for trx in record["transactions"]:
+                        print(f"  ({trx['no']}) 事务ID：{trx['trx_id']}  线程ID：{trx['thread_id']}  "
+                              f"SQL：{textwrap.shorten(trx['query'], width=100)}")
+                        for lock in trx["locks"]:
+                            print(f"      {'持有' if lock['kind'] == 'holds' else '等待'} {lock['table']} "
+                                  f"index {lock['index']} {lock['lock_mode']}")
+                    emit_table(table, "deadlock_tables", ["table", "deadlock_count", "last_time", "indexes"], records)
+
+                    # 输出表格后立即清空缓冲区
+                    sys.stdout.flush()
+
+        time.sleep(interval)
+
+
+# binlog文件第一个事件的时间戳，按 (主机, 端口, 文件名) 缓存，同一个文件只读一次文件头
+binlog_timestamp_cache = {}
+
+
+def binlog_first_timestamp(source_mysql_settings: dict, log_file: str) -> int:
+    """读取binlog文件开头的 FormatDescriptionEvent，返回文件的创建时间，不解析后面的事件"""
+    key = (source_mysql_settings["host"], source_mysql_settings["port"], log_file)
+    if key not in binlog_timestamp_cache:
+        stream = BinLogStreamReader(connection_settings=source_mysql_settings,
+                                    server_id=123456790,
+                                    only_events=[FormatDescriptionEvent],
+                                    log_file=log_file,
+                                    log_pos=4,
+                                    resume_stream=True)
+        try:
+            binlogevent = next(iter(stream), None)
+            binlog_timestamp_cache[key] = binlogevent.timestamp if binlogevent is not None else 0
+        finally:
+            stream.close()
+    return binlog_timestamp_cache[key]
+
+
+def find_binlog_files(source_mysql_settings: dict, log_files: list, start_time: int, end_time: int) -> list:
+    """
+    在 SHOW BINARY LOGS 的文件列表中二分查找覆盖 start_time ~ end_time 的文件，
+    每个文件的时间范围是从它的第一个事件到下一个文件的第一个事件，只需要读取 O(log n) 个文件头。
+    """
+    def locate(timestamp):
+        # 第一个事件时间不晚于 timestamp 的最后一个文件，都晚于 timestamp 时返回第一个文件
+        lo, hi = 0, len(log_files) - 1
+        while lo < hi:
+            mid = (lo + hi + 1) // 2
+            if binlog_first_timestamp(source_mysql_settings, log_files[mid]) <= timestamp:
+                lo = mid
+            else:
+                hi = mid - 1
+        return lo
+
+    return log_files[locate(start_time):locate(end_time) + 1]
+
+
+def count_binlog_events(stream, covered_files: set = None, start_ts: int = None, end_ts: int = None) -> dict:
+    """
+    按表统计binlog中 insert/update/delete 行事件的次数。stream 为可迭代的行事件流，
+    读到 covered_files 之外的文件或晚于 end_ts 的事件时结束。
+    """
+    # 定义记录表的字典
+    table_counts = {}
+
+    # 开始读取日志
+    for binlogevent in stream:
+        if (covered_files is not None and stream.log_file not in covered_files) \
+                or (end_ts and binlogevent.timestamp > end_ts):
+            break
+        if start_ts and binlogevent.timestamp < start_ts:
+            continue
+
+        # 获取事件的表名和操作类型
+        table = binlogevent.table
+        event_type = type(binlogevent).__name__
+
+        # 初始化记录表的计数器
+        if table not in table_counts:
+            table_counts[table] = {'insert': 0, 'update': 0, 'delete': 0}
+
+        # 根据操作类型更新计数器
+        if event_type == 'WriteRowsEvent':
+            table_counts[table]['insert'] += 1
+        elif event_type == 'UpdateRowsEvent':
+            table_counts[table]['update'] += 1
+        elif event_type == 'DeleteRowsEvent':
+            table_counts[table]['delete'] += 1
+
+    return table_counts
+
+
+def analyze_binlog(mysql_ip: str, mysql_port: int, mysql_user: str, mysql_password: str, binlog_list: list,
+                   start_time: str = None, end_time: str = None):
     # 定义MySQL连接设置
     source_mysql_settings = {
         "host": mysql_ip,
@@ -639,69 +1762,59 @@ def analyze_binlog(mysql_ip: str, mysql_port: int, mysql_user: str, mysql_passwo
         "passwd": mysql_password
     }
 
-    binlog_start = ""
-    binlog_end = ""
-
-    if len(binlog_list) == 1:
-        binlog_start = binlog_list[0]
-    elif len(binlog_list) == 2:
-        binlog_start = binlog_list[0]
-        binlog_end = binlog_list[1]
-    else:
-        print('只能指定一个或者两个binlog文件。')
+    if len(binlog_list) > 2 or (not binlog_list and not (start_time and end_time)):
+        print('只能指定一个或者两个binlog文件，或者不指定文件，用 --start-time 和 --end-time 按时间范围自动定位。')
         sys.exit(0)
 
-    # 解析起始和结束索引
-    start_index = int(binlog_start.split('.')[-1])
-    end_index = int(binlog_end.split('.')[-1]) if binlog_end else start_index
+    # 以服务器上实际存在的binlog文件为准，文件编号不连续或命名不同也能正确处理
+    conn = pymysql.connect(**source_mysql_settings)
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute("SHOW BINARY LOGS")
+            all_files = [row[0] for row in cursor.fetchall()]
+    finally:
+        conn.close()
 
-    # 根据开始和结束索引生成文件名列表
-    log_files = []
-    for i in range(start_index, end_index+1):
-        # 将文件名拼接起来
-        file_name = binlog_start.split('.')[0] + f'.{i:06d}'
-        log_files.append(file_name)
+    start_ts = int(datetime.strptime(start_time, '%Y-%m-%d %H:%M:%S').timestamp()) if start_time else None
+    end_ts = int(datetime.strptime(end_time, '%Y-%m-%d %H:%M:%S').timestamp()) if end_time else None
 
-    print(f'process binlog files is : {log_files}\n')
+    if binlog_list:
+        for name in binlog_list:
+            if name not in all_files:
+                print(f'binlog文件 {name} 不存在，SHOW BINARY LOGS 中的文件为：{all_files}')
+                sys.exit(0)
+        start_index = all_files.index(binlog_list[0])
+        end_index = all_files.index(binlog_list[-1])
+        log_files = all_files[start_index:end_index + 1]
+    else:
+        log_files = find_binlog_files(source_mysql_settings, all_files, start_ts, end_ts)
 
-    # 定义记录表的字典
-    table_counts = {}
+    print(f'process binlog files is : {log_files}\n')
 
-    # 定义Binlog解析器
-    for log_file in log_files:
-        # 提取文件名中的数字部分
-        file_number = int(re.search(r'\d+', log_file).group())
+    # 从第一个文件开始顺序读取，非阻塞模式下读完一个文件会自动进入下一个文件，超出列表后结束
+    stream = BinLogStreamReader(connection_settings=source_mysql_settings,
+                                server_id=123456789,
+                                only_events=[WriteRowsEvent, UpdateRowsEvent, DeleteRowsEvent],
+                                log_file=log_files[0],
+                                log_pos=4,
+                                resume_stream=True)
 
-        stream = BinLogStreamReader(connection_settings=source_mysql_settings,
-                                    server_id=123456789,
-                                    log_file=log_file,
-                                    resume_stream=False)
-
-        # 开始读取日志
-        for binlogevent in stream:
-            # 只处理数据行事件
-            if isinstance(binlogevent, (WriteRowsEvent, UpdateRowsEvent, DeleteRowsEvent)):
-                # 获取事件的表名和操作类型
-                table = binlogevent.table
-                event_type = type(binlogevent).__name__
-
-                # 初始化记录表的计数器
-                if table not in table_counts:
-                    table_counts[table] = {'insert': 0, 'update': 0, 'delete': 0}
-
-                # 根据操作类型更新计数器
-                if event_type == 'WriteRowsEvent':
-                    table_counts[table]['insert'] += 1
-                elif event_type == 'UpdateRowsEvent':
-                    table_counts[table]['update'] += 1
-                elif event_type == 'DeleteRowsEvent':
-                    table_counts[table]['delete'] += 1
+    try:
+        table_counts = count_binlog_events(stream, set(log_files), start_ts, end_ts)
+    finally:
+        stream.close()
 
     # 按照操作次数排序输出最终结果
     sorted_table_counts = sorted(table_counts.items(),
                                  key=lambda x: sum(x[1].values()), reverse=True)
 
     # 打印当前文件的统计结果
+    if output_format == 'jsonl':
+        emit_rows("binlog_table_counts", ["table", "insert", "update", "delete"],
+                  [[table, counts['insert'], counts['update'], counts['delete']]
+                   for table, counts in sorted_table_counts])
+        return
+
     for table, counts in sorted_table_counts:
         print(f'{table}: {counts}\n')
 
@@ -724,38 +1837,178 @@ class MySQL_Check(object):
             print("Error %d: %s" % (e.args[0], e.args[1]))
             sys.exit('MySQL Replication Health is NOT OK!')
 
+    def _read_node_status(self, connection, port):
+        """
+        在一个连接上各执行一次 SHOW SLAVE STATUS、SHOW SLAVE HOSTS 和 Binlog Dump 线程查询，缓存节点状态，
+        并推算出下游从库的地址。没有配置 report_host 的从库只能从 processlist 拿到IP，端口沿用当前节点的端口。
+        """
+        cursor = connection.cursor(cursor=pymysql.cursors.DictCursor)  # 以字典的形式返回操作结果
+        try:
+            cursor.execute('SHOW SLAVE STATUS')
+            slave_status = cursor.fetchall()
+            cursor.execute('SHOW SLAVE HOSTS')
+            slave_hosts = cursor.fetchall()
+            cursor.execute("select host from information_schema.processlist where command like \'%Binlog Dump%\'")
+            dump_hosts = [row['host'].split(':')[0] for row in cursor.fetchall()]
+        finally:
+            cursor.close()
+
+        replicas = []
+        reported = set()
+        for row in slave_hosts:
+            if row.get('Host'):
+                replicas.append((row['Host'], int(row['Port'])))
+                reported.add(row['Host'])
+        for host in dump_hosts:
+            if host not in reported:
+                replicas.append((host, port))
+                reported.add(host)
+
+        return {"slave_status": slave_status, "slave_hosts": slave_hosts, "dump_hosts": dump_hosts,
+                "replicas": replicas, "error": None}
+
+    def _crawl_node(self, host, port, timeout):
+        """连接一个下游节点并读取状态，连接失败或超时记录错误信息，不中断整个拓扑的发现"""
+        try:
+            connection = pymysql.connect(host=host, port=port, user=self._user, passwd=self._password,
+                                         connect_timeout=timeout, read_timeout=timeout)
+        except pymysql.Error as e:
+            return host, port, {"slave_status": [], "replicas": [], "error": str(e.args[-1])}
+        try:
+            return host, port, self._read_node_status(connection, port)
+        except pymysql.Error as e:
+            return host, port, {"slave_status": [], "replicas": [], "error": str(e.args[-1])}
+        finally:
+            connection.close()
+
+    def crawl_topology(self, root_status, max_workers=8, timeout=5):
+        """
+        从当前节点开始并发地递归发现所有下游从库，同时最多 max_workers 个连接，每个连接有超时限制。
+        返回 {(host, port): 节点状态}
+        """
+        nodes = {(self._host, self._port): root_status}
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            pending = set()
+
+            def submit_replicas(status):
+                for replica in status["replicas"]:
+                    if replica not in nodes:
+                        nodes[replica] = None
+                        pending.add(executor.submit(self._crawl_node, replica[0], replica[1], timeout))
+
+            submit_replicas(root_status)
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    pending.discard(future)
+                    host, port, status = future.result()
+                    nodes[(host, port)] = status
+                    submit_replicas(status)
+
+        return nodes
+
+    @staticmethod
+    def _edge_status(parent, status):
+        rows = status["slave_status"]
+        # 多源复制时找到指向上游的那个通道
+        for row in rows:
+            if row['Master_Host'] == parent[0] and int(row['Master_Port']) == parent[1]:
+                return row
+        return rows[0] if len(rows) == 1 else None
+
+    def emit_topology(self, nodes):
+        """jsonl 格式按复制关系输出 topology 记录，每条记录是一个上游到从库的复制通道"""
+        rows = []
+        for address, status in nodes.items():
+            if not status:
+                continue
+            for replica in status["replicas"]:
+                replica_status = nodes.get(replica)
+                if replica_status is None:
+                    continue
+                row = None if replica_status["error"] else self._edge_status(address, replica_status)
+                rows.append([address[0], address[1], replica[0], replica[1], replica_status["error"],
+                             row and row['Seconds_Behind_Master'], row and row['Slave_IO_Running'],
+                             row and row['Slave_SQL_Running']])
+        emit_rows("topology", ["source_host", "source_port", "replica_host", "replica_port", "error",
+                               "seconds_behind_master", "io_running", "sql_running"], rows)
+
+    def print_topology(self, nodes):
+        """按树形打印复制拓扑，每条边显示从库相对于上游的延迟和IO/SQL线程状态"""
+        printed = set()
+        edge_status = self._edge_status
+
+        def print_node(address, depth):
+            printed.add(address)
+            for replica in nodes[address]["replicas"]:
+                status = nodes.get(replica)
+                indent = '    ' * depth
+                if status is None:
+                    continue
+                if status["error"]:
+                    print(f"{indent} +--{replica[0]}:{replica[1]}  \033[1;31m无法连接：{status['error']}\033[0m")
+                    continue
+                row = edge_status(address, status)
+                if row is None:
+                    print(f"{indent} +--{replica[0]}:{replica[1]}")
+                else:
+                    healthy = row['Slave_IO_Running'] == 'Yes' and row['Slave_SQL_Running'] == 'Yes'
+                    lag = row['Seconds_Behind_Master']
+                    text = (f"{indent} +--{replica[0]}:{replica[1]}  延迟：{lag if lag is not None else 'NULL'}秒  "
+                            f"IO：{row['Slave_IO_Running']}  SQL：{row['Slave_SQL_Running']}")
+                    print(text if healthy else f"\033[1;31m{text}\033[0m")
+                if replica in printed:
+                    # 双主、环形复制或同一从库被多个上游报告，避免重复展开和无限递归
+                    print(f"{indent}     (下游拓扑已在上方显示)")
+                    continue
+                print_node(replica, depth + 1)
+
+        print_node((self._host, self._port), 0)
+
     def chek_repl_status(self):
-        cursor = self._connection.cursor(cursor=pymysql.cursors.DictCursor)  # 以字典的形式返回操作结果
         try:
-            if cursor.execute('SHOW SLAVE HOSTS') >= 1 and cursor.execute('SHOW SLAVE STATUS') == 0:
-                cursor.execute("select host from information_schema.processlist where command like \'%Binlog Dump%\'")
-                s_list = cursor.fetchall()
-                print('%s:%s - 这是一台主库.' % (self._host, self._port))
-                for current_slave in s_list:
-                    slave = current_slave['host'].split(':')[0]
-                    #print(f"+--从库是：{slave}")
-                    print(f" +--{slave}(current slave)")
-            elif cursor.execute('SHOW SLAVE HOSTS') == 0 and cursor.execute('SHOW SLAVE STATUS') == 1:
-                cursor.execute('SHOW SLAVE STATUS')
-                r_dict = cursor.fetchone()
-                print('%s:%s - 这是一台从库. 它与主库 %s:%s 进行复制.' % (self._host, self._port, r_dict['Master_Host'], r_dict['Master_Port']))
-            elif cursor.execute('SHOW SLAVE HOSTS') >= 1 and cursor.execute('SHOW SLAVE STATUS') == 1:
-                cursor.execute('SHOW SLAVE STATUS')
-                r_dict = cursor.fetchone()
-                print('%s:%s - 这是一台级联复制的从库.它与主库 %s:%s 进行复制.' % (self._host, self._port, r_dict['Master_Host'], r_dict['Master_Port']))
-                cursor.execute("select host from information_schema.processlist where command like \'%Binlog Dump%\'")
-                s_list = cursor.fetchall()
-                for current_slave in s_list:
-                    slave = current_slave['host'].split(':')[0]
-                    print(f" +--{slave}(二级从库)")
-            else:
-                print('\033[1;31m%s:%s - 这台机器你没有设置主从复制.\033[0m' % (self._host, self._port))
+            root_status = self._read_node_status(self._connection, self._port)
         except pymysql.Error as e:
             print("Error %d: %s" % (e.args[0], e.args[1]))
             sys.exit('MySQL Replication Health is NOT OK!')
-        finally:
-            cursor.close()
 
+        has_slaves = len(root_status["slave_hosts"]) >= 1 or len(root_status["dump_hosts"]) >= 1
+        slave_status = root_status["slave_status"]
+
+        if output_format == 'jsonl':
+            if has_slaves:
+                role = 'intermediate' if slave_status else 'source'
+            else:
+                role = 'replica' if slave_status else 'standalone'
+            # 每个复制通道一条记录，不是从库时输出一条只有角色的记录
+            emit_rows("replication_status",
+                      ["host", "port", "role", "channel", "master_host", "master_port", "io_running", "sql_running",
+                       "seconds_behind_master", "auto_position", "last_error", "last_sql_error"],
+                      [[self._host, self._port, role, row.get('Channel_Name'), row['Master_Host'],
+                        row['Master_Port'], row['Slave_IO_Running'], row['Slave_SQL_Running'],
+                        row['Seconds_Behind_Master'], row.get('Auto_Position'), row['Last_Error'],
+                        row['Last_SQL_Error']] for row in slave_status]
+                      or [[self._host, self._port, role] + [None] * 9])
+            if has_slaves:
+                self.emit_topology(self.crawl_topology(root_status))
+            return
+
+        if has_slaves and not slave_status:
+            print('%s:%s - 这是一台主库.' % (self._host, self._port))
+        elif not has_slaves and slave_status:
+            r_dict = slave_status[0]
+            print('%s:%s - 这是一台从库. 它与主库 %s:%s 进行复制.' % (self._host, self._port, r_dict['Master_Host'], r_dict['Master_Port']))
+        elif has_slaves and slave_status:
+            r_dict = slave_status[0]
+            print('%s:%s - 这是一台级联复制的从库.它与主库 %s:%s 进行复制.' % (self._host, self._port, r_dict['Master_Host'], r_dict['Master_Port']))
+        else:
+            print('\033[1;31m%s:%s - 这台机器你没有设置主从复制.\033[0m' % (self._host, self._port))
+
+        if has_slaves:
+            started = time.time()
+            nodes = self.crawl_topology(root_status)
+            self.print_topology(nodes)
+            print(f"共发现 {len(nodes) - 1} 个下游从库，耗时 {time.time() - started:.2f} 秒")
 
     def get_slave_status(self):
         cursor = self._connection.cursor(cursor=pymysql.cursors.DictCursor)  # 以字典的形式返回操作结果
@@ -763,7 +2016,19 @@ class MySQL_Check(object):
             is_slave = cursor.execute('SHOW SLAVE STATUS')
             r_dict = cursor.fetchone()
 
-            if is_slave == 1:
+            if is_slave == 1 and output_format == 'jsonl':
+                # 复制状态已经在 replication_status 记录中输出，这里只补充 worker 的最近一次报错
+                if r_dict['Slave_IO_Running'] != 'Yes' or r_dict['Slave_SQL_Running'] != 'Yes':
+                    cursor.execute('select LAST_ERROR_NUMBER,LAST_ERROR_MESSAGE,LAST_ERROR_TIMESTAMP '
+                                   'from performance_schema.replication_applier_status_by_worker '
+                                   'ORDER BY LAST_ERROR_TIMESTAMP desc limit 1')
+                    error_dict = cursor.fetchone()
+                    if error_dict:
+                        emit_rows("replication_worker_error", ["host", "port", "error_number", "error_message",
+                                                               "error_time"],
+                                  [[self._host, self._port, error_dict['LAST_ERROR_NUMBER'],
+                                    error_dict['LAST_ERROR_MESSAGE'], error_dict['LAST_ERROR_TIMESTAMP']]])
+            elif is_slave == 1:
                 if r_dict['Slave_IO_Running'] == 'Yes' and r_dict['Slave_SQL_Running'] == 'Yes':
                     if r_dict['Seconds_Behind_Master'] == 0:
                         print('\033[1;36m同步正常，无延迟. \033[0m')
@@ -797,6 +2062,250 @@ class MySQL_Check(object):
 
 ###### End class MySQL_Check
 
+#############################################################################################
+class LagHistogram(object):
+    """
+    滚动窗口的延迟直方图，按对数刻度分桶（0.1毫秒到约1小时），只保留最近 window 个样本，
+    计算分位数时遍历桶计数，不需要对样本排序。
+    """
+
+    # 桶上界（秒），每个桶比上一个大25%
+    BOUNDS = []
+    _bound = 0.0001
+    while _bound < 3600:
+        BOUNDS.append(_bound)
+        _bound *= 1.25
+    BOUNDS.append(float('inf'))
+    del _bound
+
+    def __init__(self, window):
+        self._samples = deque()
+        self._window = window
+        self._counts = [0] * len(self.BOUNDS)
+        self.last = None
+
+    def add(self, value):
+        index = bisect.bisect_left(self.BOUNDS, value)
+        self._samples.append((index, value))
+        self._counts[index] += 1
+        self.last = value
+        if len(self._samples) > self._window:
+            old_index, old_value = self._samples.popleft()
+            self._counts[old_index] -= 1
+
+    def maximum(self):
+        return max(v for _, v in self._samples) if self._samples else None
+
+    def percentile(self, p):
+        total = len(self._samples)
+        if total == 0:
+            return None
+        rank = p / 100 * total
+        seen = 0
+        for index, count in enumerate(self._counts):
+            seen += count
+            if seen >= rank and count:
+                # 桶上界可能超过实际样本，用窗口内最大值截断
+                return min(self.BOUNDS[index], self.maximum())
+        return self.maximum()
+
+
+def monitor_replication_lag(mysql_ip: str, mysql_port: int, mysql_user: str, mysql_password: str, interval: float,
+                            heartbeat_table: str, create_table: bool = False):
+    """
+    mysql状态监控工具，基于心跳表持续采样主从复制延迟（与pt-heartbeat的表结构兼容）。
+    按 interval（可小于1秒）在主库写入带微秒时间戳的心跳行，同时并发读取所有从库上的心跳行，
+    心跳的写入和读取都使用本机时钟计算延迟，不受主从服务器时钟偏差影响。
+    每个从库维护一个滚动延迟直方图，显示p50/p99延迟，以及并行复制worker的事务应用速率。
+    Args:
+        mysql_ip: str, 主库IP地址
+        mysql_port: int, 主库端口号
+        mysql_user: str, MySQL用户名
+        mysql_password: str, MySQL用户密码
+        interval: float, 心跳间隔（秒）
+        heartbeat_table: str, 心跳表，格式为 库名.表名
+        create_table: bool, 心跳表不存在时是否创建（DDL会复制到所有从库），默认不创建并退出
+    Returns:
+        None
+    """
+
+    WINDOW_SECONDS = 300   # 直方图保留最近5分钟的样本
+
+    schema_name, table_name = heartbeat_table.split('.', 1)
+    table_ident = f"`{schema_name}`.`{table_name}`"
+
+    # 连接MySQL主库
+    conn = pymysql.connect(
+        host=mysql_ip,
+        port=mysql_port,
+        user=mysql_user,
+        password=mysql_password,
+        autocommit=True
+    )
+
+    def signal_handler(sig, frame):
+        print('程序被终止')
+        sys.exit(0)
+
+    # 注册信号处理函数
+    signal.signal(signal.SIGINT, signal_handler)  # Ctrl+C
+    signal.signal(signal.SIGTSTP, signal_handler)  # Ctrl+Z
+
+    cursor = conn.cursor()
+    cursor.execute("SELECT @@server_id")
+    server_id = cursor.fetchone()[0]
+    cursor.execute("SELECT 1 FROM information_schema.TABLES WHERE TABLE_SCHEMA = %s AND TABLE_NAME = %s",
+                   (schema_name, table_name))
+    if cursor.fetchone() is None:
+        if not create_table:
+            print(f'{mysql_ip}:{mysql_port} - 心跳表 {heartbeat_table} 不存在，'
+                  f'请先创建或使用 --create-heartbeat-table 自动创建（建表语句会复制到所有从库）.')
+            sys.exit(1)
+        cursor.execute(f"CREATE DATABASE IF NOT EXISTS `{schema_name}`")
+        cursor.execute(f"CREATE TABLE IF NOT EXISTS {table_ident} ("
+                       "ts varchar(26) NOT NULL, server_id int unsigned NOT NULL PRIMARY KEY, "
+                       "file varchar(255) DEFAULT NULL, position bigint unsigned DEFAULT NULL, "
+                       "relay_master_log_file varchar(255) DEFAULT NULL, exec_master_log_pos bigint unsigned DEFAULT NULL)")
+
+    # 复用拓扑发现找到所有下游从库（包括级联从库）
+    checker = MySQL_Check(mysql_ip, mysql_port, mysql_user, mysql_password)
+    root_status = checker._read_node_status(checker._connection, checker._port)
+    nodes = checker.crawl_topology(root_status)
+    replicas = [address for address, status in nodes.items()
+                if address != (checker._host, checker._port) and status and not status["error"]]
+    if not replicas:
+        print('%s:%s - 没有发现可以连接的从库.' % (mysql_ip, mysql_port))
+        sys.exit(0)
+
+    def connect_replica(address):
+        # 连接失败时返回 None，下一次采样时重连
+        try:
+            return pymysql.connect(host=address[0], port=address[1], user=mysql_user, password=mysql_password,
+                                   autocommit=True, connect_timeout=5, read_timeout=5)
+        except pymysql.Error:
+            return None
+
+    def drop_replica(address):
+        conn_to_close = replica_conns[address]
+        replica_conns[address] = None
+        if conn_to_close is not None:
+            try:
+                conn_to_close.close()
+            except pymysql.Error:
+                pass
+
+    replica_conns = {address: connect_replica(address) for address in replicas}
+
+    window = max(int(WINDOW_SECONDS / interval), 1)
+    histograms = {address: LagHistogram(window) for address in replicas}
+    applied = {address: None for address in replicas}   # 上一次采样的 (时间, 已应用事务数)
+    throughput = {address: (None, None) for address in replicas}   # (每秒应用事务数, 工作中的worker数)
+    reachable = {address: replica_conns[address] is not None for address in replicas}
+
+    def read_heartbeat(address):
+        """返回 (从库地址, 延迟秒数, 是否可连接)，单个从库重启或超时不影响其它从库的采样"""
+        if replica_conns[address] is None:
+            replica_conns[address] = connect_replica(address)
+            if replica_conns[address] is None:
+                return address, None, False
+        try:
+            with replica_conns[address].cursor() as replica_cursor:
+                replica_cursor.execute(f"SELECT ts FROM {table_ident} WHERE server_id = %s", (server_id,))
+                row = replica_cursor.fetchone()
+        except pymysql.Error:
+            drop_replica(address)
+            return address, None, False
+        now = time.time()
+        return address, (now - datetime.fromisoformat(row[0]).timestamp()) if row else None, True
+
+    def read_workers(address):
+        # 按worker线程关联事务汇总表，统计已提交的事务数量
+        if replica_conns[address] is None:
+            return address, time.time(), None
+        replica_cursor = replica_conns[address].cursor()
+        try:
+            replica_cursor.execute(
+                "SELECT COUNT(*), SUM(w.SERVICE_STATE = 'ON'), SUM(t.COUNT_STAR) "
+                "FROM performance_schema.replication_applier_status_by_worker w "
+                "LEFT JOIN performance_schema.events_transactions_summary_by_thread_by_event_name t "
+                "ON t.THREAD_ID = w.THREAD_ID AND t.EVENT_NAME = 'transaction'")
+            return address, time.time(), replica_cursor.fetchone()
+        except pymysql.Error:
+            return address, time.time(), None
+        finally:
+            replica_cursor.close()
+
+    render_every = max(int(1 / interval), 1)
+    tick = 0
+
+    with ThreadPoolExecutor(max_workers=min(len(replicas), 16)) as executor:
+        while True:
+            started = time.time()
+
+            cursor.execute(f"REPLACE INTO {table_ident} (ts, server_id) VALUES (%s, %s)",
+                           (datetime.fromtimestamp(started).isoformat(timespec='microseconds'), server_id))
+
+            for address, lag, connected in executor.map(read_heartbeat, replicas):
+                reachable[address] = connected
+                if lag is not None:
+                    histograms[address].add(max(lag, 0.0))
+
+            tick += 1
+            if tick % render_every == 0:
+                for address, sampled_at, row in executor.map(read_workers, replicas):
+                    if row is None or row[2] is None:
+                        throughput[address] = (None, row[1] if row else None)
+                        continue
+                    prev = applied[address]
+                    applied[address] = (sampled_at, int(row[2]))
+                    if prev is not None and sampled_at > prev[0]:
+                        throughput[address] = ((int(row[2]) - prev[1]) / (sampled_at - prev[0]), row[1])
+
+                # 创建表格对象
+                table = PrettyTable()
+                table.field_names = ["从库", "当前延迟(ms)", "p50延迟(ms)", "p99延迟(ms)", "最大延迟(ms)", "worker数",
+                                     "应用事务数/秒"]
+
+                # 设置每列的对齐方式为左对齐
+                table.align = "l"
+
+                records = []
+                for address in replicas:
+                    histogram = histograms[address]
+                    trx_per_second, workers = throughput[address]
+                    if not reachable[address] or histogram.last is None:
+                        records.append([f"{address[0]}:{address[1]}", reachable[address], None, None, None, None,
+                                        workers if reachable[address] else None, None])
+                    else:
+                        records.append([f"{address[0]}:{address[1]}", True, histogram.last * 1000,
+                                        histogram.percentile(50) * 1000, histogram.percentile(99) * 1000,
+                                        histogram.maximum() * 1000, workers, trx_per_second])
+                    if not reachable[address]:
+                        table.add_row([f"{address[0]}:{address[1]}", "不可连接", "-", "-", "-", "-", "-"])
+                        continue
+                    if histogram.last is None:
+                        table.add_row([f"{address[0]}:{address[1]}", "-", "-", "-", "-", workers, "-"])
+                        continue
+                    table.add_row([f"{address[0]}:{address[1]}", "{:.1f}".format(histogram.last * 1000),
+                                   "{:.1f}".format(histogram.percentile(50) * 1000),
+                                   "{:.1f}".format(histogram.percentile(99) * 1000),
+                                   "{:.1f}".format(histogram.maximum() * 1000), workers,
+                                   "-" if trx_per_second is None else "{:.1f}".format(trx_per_second)])
+
+                # 清空控制台
+                print("\033c", end="")
+
+                print(f"采样时间：{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}  心跳表：{heartbeat_table}  "
+                      f"心跳间隔：{interval}秒  统计窗口：{WINDOW_SECONDS}秒")
+                emit_table(table, "replication_lag", ["replica", "reachable", "lag_ms", "p50_ms", "p99_ms", "max_ms",
+                                                      "workers", "trx_per_sec"], records)
+
+                # 输出表格后立即清空缓冲区
+                sys.stdout.flush()
+
+            time.sleep(max(interval - (time.time() - started), 0))
+
+
 #############################################################################################
 if __name__ == "__main__":
     # 创建ArgumentParser对象
@@ -808,20 +2317,41 @@ if __name__ == "__main__":
     parser.add_argument('-u', '--mysql_user', type=str, help='Mysql User', required=True)
     parser.add_argument('-p', '--mysql_password', type=str, help='Mysql Password', required=True)
     # parser.add_argument('-d', '--db_name', type=str, help='Database Name', required=True)
-    parser.add_argument('--top', type=int, metavar='N', help="需要提供一个整数类型的参数值，该参数值表示执行次数最频繁的前N条SQL语句")
-    parser.add_argument('--io', type=int, metavar='N', help="需要提供一个整数类型的参数值，该参数值表示访问次数最频繁的前N张表文件ibd")
+    parser.add_argument('--top', type=int, metavar='N', help="需要提供一个整数类型的参数值，该参数值表示执行次数最频繁的前N条SQL语句，"
+                                                            "配合--interval按采样间隔统计当前最热的SQL")
+    parser.add_argument('--io', type=int, metavar='N', help="需要提供一个整数类型的参数值，该参数值表示访问次数最频繁的前N张表文件ibd，"
+                                                           "配合--interval按采样间隔统计当前读写量最大的文件")
     parser.add_argument('--lock', action='store_true', help="查看当前锁阻塞的SQL")
     parser.add_argument('--index', action='store_true', help="查看重复或冗余的索引")
-    parser.add_argument('--conn', action='store_true', help="查看应用端IP连接数总和")
+    parser.add_argument('--conn', action='store_true', help="查看应用端IP连接数总和，配合--interval持续采样连接数变化趋势")
     parser.add_argument('--tinfo', action='store_true', help="统计库里每个表的大小")
-    parser.add_argument('--dead', action='store_true', help="查看死锁信息")
-    parser.add_argument('--binlog', nargs='+', help='Binlog分析-高峰期排查哪些表TPS比较高')
+    parser.add_argument('--autoinc', action='store_true', help="周期采样自增值，按增长速率预测自增字段耗尽天数")
+    parser.add_argument('--dead', action='store_true', help="查看死锁信息，配合--interval持续捕获死锁并按表汇总")
+    parser.add_argument('--binlog', nargs='*', help='Binlog分析-高峰期排查哪些表TPS比较高，指定起止两个binlog文件，'
+                                                    '或者不指定文件，配合--start-time/--end-time按时间范围自动定位')
+    parser.add_argument('--start-time', dest='start_time', type=str, help="Binlog分析的起始时间，如 '2023-07-06 10:00:00'")
+    parser.add_argument('--end-time', dest='end_time', type=str, help="Binlog分析的结束时间，如 '2023-07-06 22:00:00'")
     parser.add_argument('--repl', action='store_true', help="查看主从复制信息")
+    parser.add_argument('--heartbeat', action='store_true', help="基于心跳表持续采样所有从库的复制延迟（-H 指定主库）")
+    parser.add_argument('--heartbeat-table', dest='heartbeat_table', type=str, default='percona.heartbeat',
+                        help="心跳表，默认percona.heartbeat（与pt-heartbeat兼容）")
+    parser.add_argument('--create-heartbeat-table', dest='create_heartbeat_table', action='store_true',
+                        help="心跳表不存在时在主库上创建（建表语句会复制到所有从库），默认不创建并退出")
+    parser.add_argument('--interval', type=float, metavar='S', help="采样间隔（秒），用于持续采样模式")
+    parser.add_argument('--history-file', dest='history_file', type=str, help="采样历史文件路径，用于持续采样模式")
+    parser.add_argument('--format', choices=['table', 'jsonl'], default='table',
+                        help="输出格式：table（默认）或 jsonl（每行一个JSON对象，提示信息输出到标准错误）")
     parser.add_argument('-v', '--version', action='version', version='mysqlstat工具版本号: 1.0.4，更新日期：2023-10-16')
 
     # 解析命令行参数
     args = parser.parse_args()
 
+    if args.format == 'jsonl':
+        # 标准输出上只保留JSON Lines记录，表格之外的提示信息改写到标准错误
+        output_format = 'jsonl'
+        record_stream = sys.stdout
+        sys.stdout = sys.stderr
+
     # 获取变量值
     mysql_ip = args.mysql_ip
     mysql_port = args.mysql_port
@@ -834,33 +2364,54 @@ if __name__ == "__main__":
     top_index_sql = args.index
     top_conn_sql = args.conn
     top_table_info = args.tinfo
+    auto_increment_forecast = args.autoinc
     top_deadlock = args.dead
     binlog_list = args.binlog
     replication = args.repl
+    heartbeat = args.heartbeat
+    interval = args.interval
+    history_file = args.history_file
 
     if top_frequently_sql:
-        show_frequently_sql(mysql_ip, mysql_port, mysql_user, mysql_password, top_frequently_sql)
+        if interval:
+            show_frequently_sql_delta(mysql_ip, mysql_port, mysql_user, mysql_password, top_frequently_sql, interval)
+        else:
+            show_frequently_sql(mysql_ip, mysql_port, mysql_user, mysql_password, top_frequently_sql)
     if top_frequently_io:
-        show_frequently_io(mysql_ip, mysql_port, mysql_user, mysql_password, top_frequently_io)
+        if interval:
+            show_frequently_io_delta(mysql_ip, mysql_port, mysql_user, mysql_password, top_frequently_io, interval)
+        else:
+            show_frequently_io(mysql_ip, mysql_port, mysql_user, mysql_password, top_frequently_io)
     if top_lock_sql:
         show_lock_sql(mysql_ip, mysql_port, mysql_user, mysql_password)
     if top_index_sql:
         show_redundant_indexes(mysql_ip, mysql_port, mysql_user, mysql_password)
     if top_conn_sql:
-        show_conn_count(mysql_ip, mysql_port, mysql_user, mysql_password)
+        if interval:
+            show_conn_count_trend(mysql_ip, mysql_port, mysql_user, mysql_password, interval)
+        else:
+            show_conn_count(mysql_ip, mysql_port, mysql_user, mysql_password)
     if top_table_info:
         show_table_info(mysql_ip, mysql_port, mysql_user, mysql_password)
+    if auto_increment_forecast:
+        show_auto_increment_forecast(mysql_ip, mysql_port, mysql_user, mysql_password, interval or 60, history_file)
     if top_deadlock:
-        show_deadlock_info(mysql_ip, mysql_port, mysql_user, mysql_password)
-    if binlog_list:
-        analyze_binlog(mysql_ip, mysql_port, mysql_user, mysql_password, binlog_list)
+        if interval:
+            watch_deadlock_info(mysql_ip, mysql_port, mysql_user, mysql_password, interval, history_file)
+        else:
+            show_deadlock_info(mysql_ip, mysql_port, mysql_user, mysql_password)
+    if binlog_list is not None:
+        analyze_binlog(mysql_ip, mysql_port, mysql_user, mysql_password, binlog_list, args.start_time, args.end_time)
     if replication:
         mysql_conn = MySQL_Check(mysql_ip, mysql_port, mysql_user, mysql_password)
         mysql_conn.chek_repl_status()
         mysql_conn.get_slave_status()
+    if heartbeat:
+        monitor_replication_lag(mysql_ip, mysql_port, mysql_user, mysql_password, interval or 0.5, args.heartbeat_table,
+                                args.create_heartbeat_table)
     if not top_frequently_sql and not top_frequently_io and not top_lock_sql and not top_index_sql \
-       and not top_conn_sql and not top_table_info and not top_deadlock and not binlog_list\
-       and not replication:
+       and not top_conn_sql and not top_table_info and not top_deadlock and binlog_list is None\
+       and not replication and not auto_increment_forecast and not heartbeat:
         mysql_status_monitor(mysql_ip, mysql_port, mysql_user, mysql_password)
 
 #############################################################################################
@@ -1,34 +1,72 @@
 #!/usr/bin/env python3
 import argparse
 import time
+import codecs
+import contextlib
+import cProfile
 import datetime
+import fnmatch
+import json
+import operator
+import os
 import pytz
+import re
+import stat
 import sys
+import tempfile
 import threading
+import zlib
+from collections import OrderedDict
+from decimal import Decimal
 from concurrent.futures import ThreadPoolExecutor, wait
 from queue import Queue
 import pymysql
 from pymysqlreplication import BinLogStreamReader
+from pymysqlreplication.constants import FIELD_TYPE, NONE_SOURCE
+from pymysqlreplication.event import FormatDescriptionEvent, GtidEvent, HeartbeatLogEvent, QueryEvent, XidEvent
 from pymysqlreplication.row_event import (
+    RowsEvent,
     WriteRowsEvent,
     UpdateRowsEvent,
     DeleteRowsEvent
 )
 from tqdm import tqdm
 
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
 timezone = pytz.timezone('Asia/Shanghai')
 
 result_queue = Queue()
 result_queue_replace = Queue()
-combined_array = []
-combined_array_replace = []
 
-# 创建一个锁对象
-file_lock = threading.Lock()
+# 命令行 --only-operation 的值，作为模块导入时默认不过滤
+only_operation = None
+
+# 命令行 --binary-as-hex 的值，二进制和 BLOB/TEXT 列的取值直接输出为十六进制字面量
+binary_as_hex = False
+
+# 命令行 --where 解析后的行过滤条件（RowPredicate），按表编译后挂在渲染器上
+row_predicate = None
+
+# 命令行 --format 的值：sql 输出便于人工阅读的恢复脚本，jsonl 每行输出一个带行镜像和binlog坐标的JSON对象
+output_format = "sql"
+
+# 命令行 --coalesce 的值，按主键合并同一行的多次修改，每行只生成一条回滚语句
+coalesce_rows = False
+
+# binlog_row_metadata 不是 FULL 时 table-map 中没有主键，按这组连接参数从 information_schema 查询主键，
+# 为 None 时只使用 table-map 中的主键
+primary_key_settings = None
+
+# 命令行 --profile 时的 StageProfiler，统计各处理阶段的耗时和队列深度，未开启时为 None
+profiler = None
 
 
 def check_binlog_settings(mysql_host=None, mysql_port=None, mysql_user=None,
-                          mysql_passwd=None, mysql_database=None, mysql_charset=None):
+                          mysql_passwd=None, mysql_database=None, mysql_charset=None, coalesce=False):
     # 连接 MySQL 数据库
     source_mysql_settings = {
         "host": mysql_host,
@@ -53,138 +91,1577 @@ def check_binlog_settings(mysql_host=None, mysql_port=None, mysql_user=None,
         row = cursor.fetchone()
         binlog_row_image = row[1]
 
+        # 查询 binlog_row_metadata 的值，8.0.1 之前没有这个变量，table-map 中不带主键
+        cursor.execute("SHOW VARIABLES LIKE 'binlog_row_metadata'")
+        row = cursor.fetchone()
+        binlog_row_metadata = row[1] if row else None
+
         # 检查参数值是否满足条件
-        if binlog_format != 'ROW' and binlog_row_image != 'FULL':
-            exit("\nMySQL 的变量参数 binlog_format 的值应为 ROW，参数 binlog_row_image 的值应为 FULL\n")
+        if binlog_format != 'ROW':
+            exit("\nMySQL 的变量参数 binlog_format 的值应为 ROW\n")
+
+        if binlog_row_image != 'FULL' and coalesce:
+            # 合并需要完整的行镜像来定位同一行并恢复最早的镜像，部分镜像会让不同的行串在一起
+            exit(f"\nbinlog_row_image 的值为 {binlog_row_image}，--coalesce 需要完整的行镜像，请设置为 FULL\n")
+
+        if binlog_row_image != 'FULL':
+            print(f"\n注意：binlog_row_image 的值为 {binlog_row_image}，回滚语句按主键定位行，"
+                  f"binlog中没有记录原值的列无法恢复，对应的回滚语句会被注释掉，建议设置为 FULL\n")
+
+        if binlog_row_metadata != 'FULL':
+            print(f"\n注意：binlog_row_metadata 的值为 {binlog_row_metadata or '（不支持）'}，binlog中没有主键信息，"
+                  f"回滚语句的主键从 information_schema 按表的当前结构查询，之后修改过主键的表请人工核对\n")
 
     finally:
         # 关闭数据库连接
         cursor.close()
         conn.close()
 
+    return binlog_row_metadata == 'FULL'
 
-def process_binlogevent(binlogevent, start_time, end_time):
-    database_name = binlogevent.schema
 
-    if start_time <= binlogevent.timestamp <= end_time:
-        for row in binlogevent.rows:
-            event_time = binlogevent.timestamp
+# binlog文件第一个事件的时间戳，按 (主机, 端口, 文件名) 缓存，同一个文件只读一次文件头
+binlog_timestamp_cache = {}
 
-            if isinstance(binlogevent, WriteRowsEvent):
-                if only_operation and only_operation != 'insert':
-                    continue
-                else:
-                    sql = "INSERT INTO {}({}) VALUES ({});".format(
-                        f"`{database_name}`.`{binlogevent.table}`" if database_name else binlogevent.table,
-                        ','.join(["`{}`".format(k) for k in row["values"].keys()]),
-                        ','.join(["'{}'".format(v) if isinstance(v, (
-                            str, datetime.datetime, datetime.date)) else 'NULL' if v is None else str(v)
-                                  for v in row["values"].values()])
-                    )
-
-                    rollback_sql = "DELETE FROM {} WHERE {};".format(f"`{database_name}`.`{binlogevent.table}`"
-                                                                     if database_name else binlogevent.table,
-                                                                     ' AND '.join(["`{}`={}".format(k, "'{}'".format(v)
-                                                                     if isinstance(v, (str,
-                                                                                       datetime.datetime, datetime.date)) else 'NULL' if v is None else str(
-                                                                         v))
-                                                                                   for k, v in row["values"].items()]))
-
-                    result_queue.put({"event_time": event_time, "sql": sql, "rollback_sql": rollback_sql})
-
-            elif isinstance(binlogevent, UpdateRowsEvent):
-                if only_operation and only_operation != 'update':
-                    continue
-                else:
-                    set_values = []
-                    for k, v in row["after_values"].items():
-                        if isinstance(v, str):
-                            set_values.append(f"`{k}`='{v}'")
-                        elif isinstance(v, (datetime.datetime, datetime.date)):
-                            set_values.append(f"`{k}`='{v}'")  # 将时间字段转换为字符串形式
-                        else:
-                            set_values.append(f"`{k}`={v}" if v is not None else f"`{k}`= NULL")
-                    set_clause = ','.join(set_values)
-
-                    where_values = []
-                    for k, v in row["before_values"].items():
-                        if isinstance(v, str):
-                            where_values.append(f"`{k}`='{v}'")
-                        elif isinstance(v, (datetime.datetime, datetime.date)):
-                            where_values.append(f"`{k}`='{v}'")  # 添加对时间类型的处理
-                        else:
-                            where_values.append(f"`{k}`={v}" if v is not None else f"`{k}` IS NULL")
-                    where_clause = ' AND '.join(where_values)
-
-                    sql = f"UPDATE `{database_name}`.`{binlogevent.table}` SET {set_clause} WHERE {where_clause};"
-
-                    rollback_set_values = []
-                    for k, v in row["before_values"].items():
-                        if isinstance(v, str):
-                            rollback_set_values.append(f"`{k}`='{v}'")
-                        elif isinstance(v, (datetime.datetime, datetime.date)):
-                            rollback_set_values.append(f"`{k}`='{v}'")  # 添加对时间类型的处理
-                        else:
-                            rollback_set_values.append(f"`{k}`={v}" if v is not None else f"`{k}`=NULL")
-                    rollback_set_clause = ','.join(rollback_set_values)
-
-                    rollback_where_values = []
-                    for k, v in row["after_values"].items():
-                        if isinstance(v, str):
-                            rollback_where_values.append(f"`{k}`='{v}'")
-                        elif isinstance(v, (datetime.datetime, datetime.date)):
-                            rollback_where_values.append(f"`{k}`='{v}'")  # 添加对时间类型的处理
-                        else:
-                            rollback_where_values.append(f"`{k}`={v}" if v is not None else f"`{k}` IS NULL")
-                    rollback_where_clause = ' AND '.join(rollback_where_values)
-
-                    rollback_sql = f"UPDATE `{database_name}`.`{binlogevent.table}` SET {rollback_set_clause} WHERE {rollback_where_clause};"
-
-                    try:
-                        rollback_replace_set_values = []
-                        for v in row["before_values"].values():
-                            if v is None:
-                                rollback_replace_set_values.append("NULL")
-                            elif isinstance(v, (str, datetime.datetime, datetime.date)):
-                                rollback_replace_set_values.append(f"'{v}'")
-                            else:
-                                rollback_replace_set_values.append(str(v))
-                        rollback_replace_set_clause = ','.join(rollback_replace_set_values)
-                        fields_clause = ','.join([f"`{k}`" for k in row["after_values"].keys()])
-                        rollback_replace_sql = f"REPLACE INTO `{database_name}`.`{binlogevent.table}` ({fields_clause}) VALUES ({rollback_replace_set_clause});"
-                    except Exception as e:
-                        print("出现异常错误：", e)
-                    # print(rollback_replace_sql)
-
-                    result_queue.put({"event_time": event_time, "sql": sql, "rollback_sql": rollback_sql})
-                    result_queue_replace.put(
-                        {"event_time": event_time, "sql": sql, "rollback_sql": rollback_replace_sql})
-
-            elif isinstance(binlogevent, DeleteRowsEvent):
-                if only_operation and only_operation != 'delete':
+
+def binlog_first_timestamp(source_mysql_settings, log_file):
+    """读取binlog文件开头的 FormatDescriptionEvent，返回文件的创建时间，不解析后面的事件"""
+    key = (source_mysql_settings["host"], source_mysql_settings["port"], log_file)
+    if key not in binlog_timestamp_cache:
+        stream = BinLogStreamReader(
+            connection_settings=source_mysql_settings,
+            server_id=1234567892,
+            blocking=False,
+            resume_stream=True,
+            only_events=[FormatDescriptionEvent],
+            log_file=log_file,
+            log_pos=4
+        )
+        try:
+            binlogevent = next(iter(stream), None)
+            binlog_timestamp_cache[key] = binlogevent.timestamp if binlogevent is not None else 0
+        finally:
+            stream.close()
+    return binlog_timestamp_cache[key]
+
+
+def list_binary_logs(source_mysql_settings):
+    """返回 SHOW BINARY LOGS 的 [(文件名, 字节数), ...]"""
+    conn = pymysql.connect(**source_mysql_settings)
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute("SHOW BINARY LOGS")
+            return [(row[0], int(row[1])) for row in cursor.fetchall()]
+    finally:
+        conn.close()
+
+
+def find_binlog_files(source_mysql_settings, log_files, start_time, end_time):
+    """
+    在 SHOW BINARY LOGS 的文件列表中二分查找覆盖 start_time ~ end_time 的binlog文件。
+    每个文件的时间范围是从它的第一个事件到下一个文件的第一个事件，只需要读取 O(log n) 个文件头。
+    """
+    if not log_files:
+        exit("\nSHOW BINARY LOGS 没有返回binlog文件，请确认已开启binlog\n")
+
+    def locate(timestamp):
+        # 第一个事件时间不晚于 timestamp 的最后一个文件，都晚于 timestamp 时返回第一个文件
+        lo, hi = 0, len(log_files) - 1
+        while lo < hi:
+            mid = (lo + hi + 1) // 2
+            if binlog_first_timestamp(source_mysql_settings, log_files[mid]) <= timestamp:
+                lo = mid
+            else:
+                hi = mid - 1
+        return lo
+
+    return log_files[locate(start_time):locate(end_time) + 1]
+
+
+class NameSet(object):
+    """
+    按匹配函数判断名称是否在集合中，结果按名称缓存。实现了 __contains__，
+    可以直接作为 BinLogStreamReader 的 only_schemas/only_tables 参数。
+    """
+
+    def __init__(self, match):
+        self.match = match
+        self.cache = {}
+
+    def __contains__(self, name):
+        matched = self.cache.get(name)
+        if matched is None:
+            matched = self.cache[name] = bool(self.match(name))
+        return matched
+
+
+class TableFilter(object):
+    """
+    --only-schemas 和 --only-tables 的组合过滤，库名和表名都支持 * 和 ? 通配符，
+    --only-tables 可以写成 table 或 schema.table。
+    stream_schemas/stream_tables 交给 BinLogStreamReader，在 table-map 事件上分别按库名和表名过滤，
+    不匹配的表的行事件不会被解码；库名和表名的组合再由 match() 精确判断，之后才读取行数据。
+    """
+
+    def __init__(self, only_schemas=None, only_tables=None):
+        self.schema_patterns = list(only_schemas or ())
+        self.table_patterns = []
+        for pattern in only_tables or ():
+            schema, sep, table = pattern.partition(".")
+            self.table_patterns.append((schema, table) if sep else (None, pattern))
+        self.pairs = {}
+
+        self.stream_schemas = None
+        if self.schema_patterns or (self.table_patterns and
+                                    all(schema is not None for schema, _ in self.table_patterns)):
+            self.stream_schemas = NameSet(self.match_schema)
+
+        self.stream_tables = None
+        if self.table_patterns:
+            self.stream_tables = NameSet(
+                lambda table: any(fnmatch.fnmatchcase(table, pattern) for _, pattern in self.table_patterns))
+
+    def match_schema(self, schema):
+        if self.schema_patterns and not any(fnmatch.fnmatchcase(schema, p) for p in self.schema_patterns):
+            return False
+        return not self.table_patterns or any(pattern is None or fnmatch.fnmatchcase(schema, pattern)
+                                              for pattern, _ in self.table_patterns)
+
+    def match(self, schema, table):
+        key = (schema, table)
+        matched = self.pairs.get(key)
+        if matched is None:
+            matched = self.match_schema(schema) and (not self.table_patterns or any(
+                (schema_pattern is None or fnmatch.fnmatchcase(schema, schema_pattern)) and
+                fnmatch.fnmatchcase(table, table_pattern) for schema_pattern, table_pattern in self.table_patterns))
+            self.pairs[key] = matched
+        return matched
+
+
+# 数值类型的列直接输出
+NUMERIC_TYPES = {
+    FIELD_TYPE.TINY, FIELD_TYPE.SHORT, FIELD_TYPE.LONG, FIELD_TYPE.INT24, FIELD_TYPE.LONGLONG,
+    FIELD_TYPE.FLOAT, FIELD_TYPE.DOUBLE, FIELD_TYPE.DECIMAL, FIELD_TYPE.NEWDECIMAL, FIELD_TYPE.YEAR
+}
+
+# 日期时间类型的取值转为字符串后不包含需要转义的字符，直接加引号
+TEMPORAL_TYPES = {
+    FIELD_TYPE.DATE, FIELD_TYPE.NEWDATE, FIELD_TYPE.DATETIME, FIELD_TYPE.DATETIME2,
+    FIELD_TYPE.TIMESTAMP, FIELD_TYPE.TIMESTAMP2
+}
+
+# MySQL 字符串字面量的转义表，下标为字符的码位，由 str.translate 在C层逐字符查表转义，
+# 码位不在表内的字符（非ASCII字符）保持不变
+ESCAPE_TABLE = [chr(x) for x in range(128)]
+ESCAPE_TABLE[0] = "\\0"
+ESCAPE_TABLE[ord("\\")] = "\\\\"
+ESCAPE_TABLE[ord("\n")] = "\\n"
+ESCAPE_TABLE[ord("\r")] = "\\r"
+ESCAPE_TABLE[ord("\032")] = "\\Z"
+ESCAPE_TABLE[ord('"')] = '\\"'
+ESCAPE_TABLE[ord("'")] = "\\'"
+
+# 与 ESCAPE_TABLE 相反，--where 中字符串字面量的转义序列，其余 \x 表示 x 本身
+UNESCAPE_TABLE = {"0": "\0", "b": "\b", "n": "\n", "r": "\r", "t": "\t", "Z": "\032"}
+
+# 格式化函数尽量直接使用内置函数和绑定方法，避免逐个取值的Python函数调用开销
+format_number = str
+format_quoted = "'{}'".format
+
+
+def format_string(v):
+    if v.__class__ is str:
+        return "'" + v.translate(ESCAPE_TABLE) + "'"
+    # 二进制字符集的列解析出来是 bytes，能按 UTF-8 解码的按字符串输出，否则输出十六进制字面量
+    try:
+        return "'" + v.decode("utf-8").translate(ESCAPE_TABLE) + "'"
+    except UnicodeDecodeError:
+        return "X'" + v.hex() + "'"
+
+
+def format_hex(v):
+    if v.__class__ is str:
+        v = v.encode("utf-8")
+    return "X'" + v.hex() + "'"
+
+
+def format_time(v):
+    # TIME 类型解析为 timedelta，可能为负数或超过24小时，不能直接用 str()
+    if not isinstance(v, datetime.timedelta):
+        return "'{}'".format(v)
+    total = (v.days * 86400 + v.seconds) * 1000000 + v.microseconds
+    sign = "-" if total < 0 else ""
+    hours, rest = divmod(abs(total), 3600000000)
+    minutes, rest = divmod(rest, 60000000)
+    seconds, microseconds = divmod(rest, 1000000)
+    fraction = ".{:06d}".format(microseconds) if microseconds else ""
+    return "'{}{:02d}:{:02d}:{:02d}{}'".format(sign, hours, minutes, seconds, fraction)
+
+
+def format_bit(v):
+    # BIT 类型解析为 '0101' 形式的字符串
+    return "b'" + v + "'"
+
+
+def normalize_json(v):
+    """binlog 中的 JSON 键和字符串值解析出来是 bytes，转换为可以序列化的对象"""
+    if isinstance(v, dict):
+        return {(k.decode("utf-8") if isinstance(k, bytes) else k): normalize_json(i) for k, i in v.items()}
+    if isinstance(v, list):
+        return [normalize_json(i) for i in v]
+    if isinstance(v, bytes):
+        return v.decode("utf-8", "replace")
+    return v
+
+
+def format_json(v):
+    # JSON 列和字符串比较时不会按 JSON 语义比较，需要 CAST 为 JSON
+    text = json.dumps(normalize_json(v), ensure_ascii=False, default=str)
+    return "CAST('" + text.translate(ESCAPE_TABLE) + "' AS JSON)"
+
+
+# 列类型编号对应的名称，CHAR/INTERVAL 是 TINY/ENUM 的别名
+FIELD_TYPE_NAMES = {value: name for name, value in vars(FIELD_TYPE).items()
+                    if name.isupper() and name not in ("CHAR", "INTERVAL")}
+
+
+def json_value(v):
+    """把解析出来的列值转换为可以JSON序列化的值：DECIMAL 用字符串保留精度，时间类型用ISO格式，二进制用十六进制"""
+    if v is None or isinstance(v, (bool, int, float, str)):
+        return v
+    if isinstance(v, Decimal):
+        return str(v)
+    if isinstance(v, (datetime.datetime, datetime.date, datetime.time)):
+        return v.isoformat()
+    if isinstance(v, datetime.timedelta):
+        return format_time(v)[1:-1]
+    if isinstance(v, bytes):
+        return {"hex": v.hex()}
+    if isinstance(v, (set, frozenset)):
+        return sorted(v)
+    if isinstance(v, (dict, list)):
+        return normalize_json(v)
+    return str(v)
+
+
+def make_binary_formatter(column):
+    """
+    --binary-as-hex 模式下 BLOB/TEXT 列的格式化函数：bytes 直接转十六进制，不经过解码和转义；
+    TEXT 列被解析为 str 的取值按列的字符集编码回原始字节，保证写回时字节不变。
+    """
+    encoding = "utf-8"
+    charset = getattr(column, "character_set_name", None)
+    if charset:
+        try:
+            encoding = codecs.lookup(RowsEvent.charset_to_encoding(charset)).name
+        except LookupError:
+            pass
+
+    def format_binary(v):
+        if v.__class__ is bytes:
+            return "X'" + v.hex() + "'"
+        return "X'" + v.encode(encoding, "surrogateescape").hex() + "'"
+
+    return format_binary
+
+
+def format_string_or_hex(v):
+    if v.__class__ is str:
+        return "'" + v.translate(ESCAPE_TABLE) + "'"
+    return "X'" + v.hex() + "'"
+
+
+def make_formatter(column):
+    """根据 table-map 中的列类型选择取值的格式化函数"""
+    column_type = column.type
+    if binary_as_hex:
+        if column_type == FIELD_TYPE.BLOB:
+            return make_binary_formatter(column)
+        if column_type in (FIELD_TYPE.VARCHAR, FIELD_TYPE.STRING, FIELD_TYPE.VAR_STRING):
+            # VARBINARY/BINARY 列的取值是 bytes，不再尝试按 UTF-8 解码
+            return format_string_or_hex
+    if column_type in NUMERIC_TYPES:
+        return format_number
+    if column_type in TEMPORAL_TYPES:
+        return format_quoted
+    if column_type in (FIELD_TYPE.TIME, FIELD_TYPE.TIME2):
+        return format_time
+    if column_type == FIELD_TYPE.JSON:
+        return format_json
+    if column_type == FIELD_TYPE.BIT:
+        return format_bit
+    if column_type == FIELD_TYPE.GEOMETRY:
+        return format_hex
+    if column_type == FIELD_TYPE.SET:
+        # SET 类型解析为 set，按列定义中的顺序输出
+        set_values = getattr(column, "set_values", None)
+        if set_values:
+            return lambda v: format_string(','.join([i for i in set_values if i in v]))
+        return lambda v: format_string(','.join(sorted(v)))
+    return format_string
+
+
+# 行镜像中没有记录的列（binlog_row_image=MINIMAL/NOBLOB）
+MISSING = object()
+
+# JSON 部分更新（binlog_row_value_options=PARTIAL_JSON）时 after 镜像中没有完整的新值
+PARTIAL = object()
+
+
+class TableRenderer(object):
+    """
+    按表预编译的SQL渲染器，每个table-map只构建一次。
+    预先计算好表名、列名列表、每列的取值格式化函数和语句模板，逐行渲染时每个行镜像的取值只格式化一次，
+    再拼接到 VALUES/SET/WHERE 子句中。
+    已知主键时 WHERE 子句只按主键定位行，UPDATE 的 SET 子句只包含发生变化的列。
+    """
+
+    def __init__(self, schema, table, column_names, columns, primary_key=None):
+        self.schema = schema
+        self.table = table
+        self.table_name = f"`{schema}`.`{table}`" if schema else table
+        self.columns = columns
+        self.column_names = column_names
+        self.column_index = {name: i for i, name in enumerate(column_names)}
+        self.fields = [f"`{name}`" for name in column_names]
+        self.formatters = [make_formatter(column) for column in columns]
+        self.row_filter = None
+        self.eq_prefixes = [f"`{name}`=" for name in column_names]
+        self.null_conditions = [f"`{name}` IS NULL" for name in column_names]
+
+        # 表结构元数据中的主键（binlog_row_metadata=FULL 时才有，否则由 lookup_primary_key 查询），
+        # 找不到全部主键列时按整行定位
+        names = [primary_key] if isinstance(primary_key, str) else list(primary_key or ())
+        self.key_indexes = [self.column_index[name] for name in names if name in self.column_index]
+        if not names or len(self.key_indexes) != len(names):
+            self.key_indexes = None
+
+        fields = ','.join(self.fields)
+        self.insert_template = "INSERT INTO " + self.table_name + "(" + fields + ") VALUES ({});"
+        self.insert_columns_template = "INSERT INTO " + self.table_name + "({}) VALUES ({});"
+        self.replace_template = "REPLACE INTO " + self.table_name + " (" + fields + ") VALUES ({});"
+        self.delete_template = "DELETE FROM " + self.table_name + " WHERE {};"
+        self.update_template = "UPDATE " + self.table_name + " SET {} WHERE {};"
+
+    def literals(self, values, none_sources=None):
+        """
+        把一个行镜像的取值格式化为SQL字面量列表，NULL 用 None 表示，
+        镜像中没有记录的列用 MISSING 表示，JSON 部分更新的列用 PARTIAL 表示
+        """
+        literals = [None if v is None else f(v) for f, v in zip(self.formatters, values.values())]
+        if none_sources:
+            for name, source in none_sources.items():
+                if source == NONE_SOURCE.COLS_BITMAP:
+                    literals[self.column_index[name]] = MISSING
+                elif source == NONE_SOURCE.JSON_PARTIAL_UPDATE:
+                    literals[self.column_index[name]] = PARTIAL
+        return literals
+
+    @staticmethod
+    def values_clause(literals):
+        return ','.join(['NULL' if v is None else v for v in literals])
+
+    def set_clause(self, literals, indexes):
+        # 不知道取值的列（只出现在原生sql和注释掉的不完整回滚语句中）用 ? 占位
+        return ','.join([self.eq_prefixes[i] + ('NULL' if literals[i] is None else
+                                                '?' if literals[i] is MISSING or literals[i] is PARTIAL else
+                                                literals[i]) for i in indexes])
+
+    def where_clause(self, literals):
+        indexes = self.key_indexes
+        if indexes is None or any(literals[i] is MISSING or literals[i] is PARTIAL for i in indexes):
+            indexes = [i for i, v in enumerate(literals) if v is not MISSING and v is not PARTIAL]
+        return ' AND '.join([self.null_conditions[i] if literals[i] is None else self.eq_prefixes[i] + literals[i]
+                             for i in indexes])
+
+    def insert_statement(self, literals):
+        if MISSING not in literals:
+            return self.insert_template.format(self.values_clause(literals))
+        indexes = [i for i, v in enumerate(literals) if v is not MISSING]
+        return self.insert_columns_template.format(','.join([self.fields[i] for i in indexes]),
+                                                   self.values_clause([literals[i] for i in indexes]))
+
+    @staticmethod
+    def incomplete(missing, statement):
+        """镜像中缺少原值时无法完整回滚，语句注释掉留给人工确认"""
+        return (f"-- 无法完整回滚：binlog中没有记录列 {','.join(missing)} 的原值（binlog_row_image 不是 FULL）\n"
+                f" \t-- {statement}")
+
+    def render_insert(self, values, none_sources=None):
+        """返回 (原生sql, 回滚sql)"""
+        literals = self.literals(values, none_sources)
+        return self.insert_statement(literals), self.delete_template.format(self.where_clause(literals))
+
+    def render_delete(self, values, none_sources=None):
+        """返回 (原生sql, 回滚sql)"""
+        literals = self.literals(values, none_sources)
+        sql = self.delete_template.format(self.where_clause(literals))
+        rollback_sql = self.insert_statement(literals)
+        missing = [self.fields[i] for i, v in enumerate(literals) if v is MISSING]
+        if missing:
+            rollback_sql = self.incomplete(missing, rollback_sql)
+        return sql, rollback_sql
+
+    def render_update(self, before_values, after_values, before_none_sources=None, after_none_sources=None):
+        """
+        返回 (原生sql, 回滚sql, replace形式的回滚sql)。
+        SET 子句只包含发生变化的列，WHERE 子句按修改后的行定位（after 镜像中没有的列沿用修改前的值）。
+        """
+        before = self.literals(before_values, before_none_sources)
+        after = self.literals(after_values, after_none_sources)
+        changed = [i for i, (b, a) in enumerate(zip(before, after)) if a is PARTIAL or (a is not MISSING and a != b)]
+        current = [b if a is MISSING else a for b, a in zip(before, after)]
+
+        sql = self.update_template.format(self.set_clause(after, changed), self.where_clause(before))
+        if not changed:
+            rollback_sql = "-- 行数据没有变化，无需回滚"
+            return sql, rollback_sql, rollback_sql
+
+        rollback_sql = self.update_template.format(self.set_clause(before, changed), self.where_clause(current))
+        missing = [self.fields[i] for i in changed if before[i] is MISSING]
+        if missing:
+            rollback_sql = self.incomplete(missing, rollback_sql)
+            return sql, rollback_sql, rollback_sql
+
+        # REPLACE 会把镜像中没有的列重置为默认值，before 镜像不完整时改用 UPDATE
+        if MISSING in before:
+            return sql, rollback_sql, rollback_sql
+        return sql, rollback_sql, self.replace_template.format(self.values_clause(before))
+
+
+# --where 表达式的词法规则
+WHERE_TOKEN_RE = re.compile(r"""\s*(?:
+    (?P<number>-?\d+(?:\.\d+)?)
+  | (?P<string>'(?:[^'\\]|\\.|'')*'|"(?:[^"\\]|\\.|"")*")
+  | (?P<name>`[^`]+`|[A-Za-z_][A-Za-z0-9_$]*)
+  | (?P<op><=|>=|<>|!=|==|=|<|>|\(|\)|,)
+)""", re.X | re.S)
+
+WHERE_KEYWORDS = {"AND", "OR", "NOT", "IS", "NULL", "IN", "LIKE", "BETWEEN", "TRUE", "FALSE"}
+
+WHERE_OPERATORS = {
+    "=": operator.eq, "==": operator.eq, "!=": operator.ne, "<>": operator.ne,
+    "<": operator.lt, "<=": operator.le, ">": operator.gt, ">=": operator.ge
+}
+
+INTEGER_TYPES = {
+    FIELD_TYPE.TINY, FIELD_TYPE.SHORT, FIELD_TYPE.LONG, FIELD_TYPE.INT24, FIELD_TYPE.LONGLONG, FIELD_TYPE.YEAR
+}
+
+DATETIME_TYPES = {FIELD_TYPE.DATETIME, FIELD_TYPE.DATETIME2, FIELD_TYPE.TIMESTAMP, FIELD_TYPE.TIMESTAMP2}
+
+
+def coerce_literal(column_type, value):
+    """把 --where 中的字面量转换为该列解析出来的Python类型，转换失败时保持原值"""
+    if value is None or column_type is None:
+        return value
+    try:
+        if column_type in DATETIME_TYPES and isinstance(value, str):
+            return datetime.datetime.fromisoformat(value)
+        elif column_type in (FIELD_TYPE.DATE, FIELD_TYPE.NEWDATE) and isinstance(value, str):
+            return datetime.date.fromisoformat(value)
+        elif column_type in INTEGER_TYPES and not isinstance(value, int):
+            # 只有整数值才转成 int，id = 1.5 这样的小数保持 Decimal 按数值比较，不能截断成 1
+            number = value if isinstance(value, Decimal) else Decimal(str(value))
+            return int(number) if number == number.to_integral_value() else number
+        elif column_type in (FIELD_TYPE.DECIMAL, FIELD_TYPE.NEWDECIMAL):
+            return Decimal(str(value))
+        elif column_type in (FIELD_TYPE.FLOAT, FIELD_TYPE.DOUBLE):
+            return float(value)
+        elif column_type not in NUMERIC_TYPES and column_type not in TEMPORAL_TYPES and not isinstance(value, str):
+            return str(value)
+    except (ValueError, ArithmeticError):
+        pass
+    return value
+
+
+class RowPredicate(object):
+    """
+    --where 行过滤条件，语法与SQL的WHERE子句类似：
+        比较运算 = != <> < <= > >=，IS [NOT] NULL，[NOT] IN (...)，[NOT] LIKE '...'，
+        [NOT] BETWEEN ... AND ...，AND / OR / NOT 和括号，列名可以用反引号括起来。
+    表达式只解析一次，再按表编译成闭包：字面量按列类型预先转换好，逐行求值时只做取值和比较，
+    在拼接任何SQL字符串之前过滤掉不需要的行。NULL 与任何值比较都不成立。
+    """
+
+    def __init__(self, text):
+        self.text = text
+        self.columns = set()
+        self.tokens = self.tokenize(text)
+        self.pos = 0
+        self.tree = self.parse_or()
+        if self.pos < len(self.tokens):
+            self.error(f"无法识别 {self.tokens[self.pos][1]}")
+
+    def error(self, message):
+        raise ValueError(f"--where 条件 \"{self.text}\" 有误：{message}")
+
+    def tokenize(self, text):
+        """返回 [(类型, 值, 原文), ...]，LIKE 需要从原文中区分转义的 % _ 和通配符"""
+        tokens = []
+        pos = 0
+        text = text.rstrip()
+        while pos < len(text):
+            m = WHERE_TOKEN_RE.match(text, pos)
+            if not m or m.end() == pos:
+                self.error(f"无法识别 {text[pos:].strip()[:20]}")
+            pos = m.end()
+            kind = m.lastgroup
+            value = raw = m.group(kind)
+            if kind == "number":
+                value = Decimal(value) if "." in value else int(value)
+            elif kind == "string":
+                # 与MySQL一致，\% 和 \_ 在普通字符串中保留反斜杠
+                value = "".join("\\" + c if escaped and c in "%_" else c for c, escaped in self.string_chars(raw))
+            elif kind == "name":
+                if value[0] == "`":
+                    value = value[1:-1]
+                elif value.upper() in WHERE_KEYWORDS:
+                    kind, value = "keyword", value.upper()
+            tokens.append((kind, value, raw))
+        return tokens
+
+    @staticmethod
+    def string_chars(quoted):
+        """逐个返回带引号的字符串字面量中的 (字符, 是否转义)，连续两个引号表示一个引号"""
+        quote = quoted[0]
+        chars = iter(quoted[1:-1])
+        for c in chars:
+            if c == "\\":
+                c = next(chars, "\\")
+                yield UNESCAPE_TABLE.get(c, c), True
+            elif c == quote:
+                yield next(chars, quote), False
+            else:
+                yield c, False
+
+    @classmethod
+    def like_regex(cls, quoted):
+        """把带引号的 LIKE 模式转换为正则：% 和 _ 是通配符，反斜杠转义的字符（包括 \\% \\_）按字面匹配"""
+        parts = []
+        for c, escaped in cls.string_chars(quoted):
+            if escaped:
+                parts.append(re.escape(c))
+            elif c == "%":
+                parts.append(".*")
+            elif c == "_":
+                parts.append(".")
+            else:
+                parts.append(re.escape(c))
+        return "".join(parts)
+
+    def peek(self, kind, value=None):
+        if self.pos < len(self.tokens):
+            token = self.tokens[self.pos]
+            return token[0] == kind and (value is None or token[1] == value)
+        return False
+
+    def accept(self, kind, value=None):
+        if self.peek(kind, value):
+            self.pos += 1
+            return True
+        return False
+
+    def expect(self, kind, value=None):
+        if not self.peek(kind, value):
+            found = self.tokens[self.pos][1] if self.pos < len(self.tokens) else "结尾"
+            self.error(f"在 {found} 处需要 {value or kind}")
+        self.pos += 1
+        return self.tokens[self.pos - 1][1]
+
+    def parse_or(self):
+        nodes = [self.parse_and()]
+        while self.accept("keyword", "OR"):
+            nodes.append(self.parse_and())
+        return nodes[0] if len(nodes) == 1 else ("or", nodes)
+
+    def parse_and(self):
+        nodes = [self.parse_not()]
+        while self.accept("keyword", "AND"):
+            nodes.append(self.parse_not())
+        return nodes[0] if len(nodes) == 1 else ("and", nodes)
+
+    def parse_not(self):
+        if self.accept("keyword", "NOT"):
+            return ("not", self.parse_not())
+        return self.parse_predicate()
+
+    def parse_operand(self):
+        if self.peek("name"):
+            name = self.expect("name")
+            self.columns.add(name)
+            return ("col", name)
+        elif self.peek("number") or self.peek("string"):
+            self.pos += 1
+            return ("lit", self.tokens[self.pos - 1][1])
+        elif self.accept("keyword", "NULL"):
+            return ("lit", None)
+        elif self.accept("keyword", "TRUE"):
+            return ("lit", 1)
+        elif self.accept("keyword", "FALSE"):
+            return ("lit", 0)
+        found = self.tokens[self.pos][1] if self.pos < len(self.tokens) else "结尾"
+        self.error(f"在 {found} 处需要列名或取值")
+
+    def parse_predicate(self):
+        if self.accept("op", "("):
+            node = self.parse_or()
+            self.expect("op", ")")
+            return node
+
+        left = self.parse_operand()
+        if self.pos < len(self.tokens) and self.tokens[self.pos][0] == "op" and \
+                self.tokens[self.pos][1] in WHERE_OPERATORS:
+            op = self.expect("op")
+            return ("cmp", WHERE_OPERATORS[op], left, self.parse_operand())
+
+        if self.accept("keyword", "IS"):
+            negate = self.accept("keyword", "NOT")
+            self.expect("keyword", "NULL")
+            return ("null", left, negate)
+
+        negate = self.accept("keyword", "NOT")
+        if self.accept("keyword", "IN"):
+            self.expect("op", "(")
+            items = [self.parse_operand()]
+            while self.accept("op", ","):
+                items.append(self.parse_operand())
+            self.expect("op", ")")
+            if any(item[0] != "lit" for item in items):
+                self.error("IN 列表中只能是常量")
+            return ("in", left, [item[1] for item in items], negate)
+        elif self.accept("keyword", "LIKE"):
+            self.expect("string")
+            regex = self.like_regex(self.tokens[self.pos - 1][2])
+            return ("like", left, re.compile(regex, re.S | re.I), negate)
+        elif self.accept("keyword", "BETWEEN"):
+            low = self.parse_operand()
+            self.expect("keyword", "AND")
+            return ("between", left, low, self.parse_operand(), negate)
+        elif negate:
+            self.error("NOT 之后需要 IN、LIKE 或 BETWEEN")
+
+        # 单独的列名或取值，按非空且非零判断
+        return ("truth", left)
+
+    def compile(self, column_names, columns):
+        """按表编译成 predicate(values) -> bool，表中没有的列按 NULL 处理"""
+        types = {name: column.type for name, column in zip(column_names, columns)}
+        return self._compile(self.tree, types)
+
+    def _compile(self, node, types):
+        kind = node[0]
+        if kind in ("and", "or"):
+            preds = [self._compile(child, types) for child in node[1]]
+            stop = kind == "or"  # AND 遇到不成立、OR 遇到成立时短路返回
+
+            def predicate(values):
+                for pred in preds:
+                    if pred(values) == stop:
+                        return stop
+                return not stop
+            return predicate
+
+        elif kind == "not":
+            pred = self._compile(node[1], types)
+            return lambda values: not pred(values)
+
+        elif kind == "cmp":
+            fn, left, right = node[1], node[2], node[3]
+            get_left = self.getter(left, right, types)
+            get_right = self.getter(right, left, types)
+
+            def predicate(values):
+                a = get_left(values)
+                b = get_right(values)
+                if a is None or b is None:
+                    return False
+                try:
+                    return fn(a, b)
+                except TypeError:
+                    return False
+            return predicate
+
+        elif kind == "null":
+            get, negate = self.getter(node[1], None, types), node[2]
+            return lambda values: (get(values) is None) != negate
+
+        elif kind == "in":
+            get, negate = self.getter(node[1], None, types), node[3]
+            column_type = types.get(node[1][1]) if node[1][0] == "col" else None
+            items = [coerce_literal(column_type, item) for item in node[2] if item is not None]
+            try:
+                items = frozenset(items)
+            except TypeError:
+                pass
+
+            def predicate(values):
+                v = get(values)
+                if v is None:
+                    return False
+                try:
+                    return (v in items) != negate
+                except TypeError:
+                    return False
+            return predicate
+
+        elif kind == "like":
+            get, regex, negate = self.getter(node[1], None, types), node[2], node[3]
+
+            def predicate(values):
+                v = get(values)
+                if v is None:
+                    return False
+                if isinstance(v, bytes):
+                    v = v.decode("utf-8", "surrogateescape")
+                return (regex.fullmatch(v if isinstance(v, str) else str(v)) is not None) != negate
+            return predicate
+
+        elif kind == "between":
+            get, negate = self.getter(node[1], None, types), node[4]
+            get_low = self.getter(node[2], node[1], types)
+            get_high = self.getter(node[3], node[1], types)
+
+            def predicate(values):
+                v, low, high = get(values), get_low(values), get_high(values)
+                if v is None or low is None or high is None:
+                    return False
+                try:
+                    return (low <= v <= high) != negate
+                except TypeError:
+                    return False
+            return predicate
+
+        get = self.getter(node[1], None, types)
+        return lambda values: bool(get(values))
+
+    @staticmethod
+    def getter(operand, other, types):
+        """列取值函数，或按另一侧列的类型转换好的常量"""
+        if operand[0] == "col":
+            name = operand[1]
+            return lambda values: values.get(name)
+        value = operand[1]
+        if other is not None and other[0] == "col":
+            value = coerce_literal(types.get(other[1]), value)
+        return lambda values: value
+
+
+# information_schema 查询到的主键，按 (库名, 表名) 缓存，每张表只查询一次
+primary_key_cache = {}
+primary_key_lock = threading.Lock()
+primary_key_conn = None
+
+
+def lookup_primary_key(schema, table):
+    """
+    查询表当前的主键列，没有主键时与InnoDB一样使用第一个所有列都是 NOT NULL 的唯一索引，
+    都没有或查询失败时返回 None（按整行定位）
+    """
+    global primary_key_conn
+    key = (schema, table)
+    with primary_key_lock:
+        if key in primary_key_cache:
+            return primary_key_cache[key]
+        indexes = {}
+        try:
+            if primary_key_conn is None:
+                primary_key_conn = pymysql.connect(**primary_key_settings)
+            with primary_key_conn.cursor() as cursor:
+                cursor.execute("SELECT INDEX_NAME, COLUMN_NAME, NULLABLE FROM information_schema.STATISTICS "
+                               "WHERE TABLE_SCHEMA = %s AND TABLE_NAME = %s AND NON_UNIQUE = 0 "
+                               "ORDER BY INDEX_NAME = 'PRIMARY' DESC, INDEX_NAME, SEQ_IN_INDEX", (schema, table))
+                for index_name, column_name, nullable in cursor.fetchall():
+                    indexes.setdefault(index_name, []).append((column_name, nullable))
+        except pymysql.err.Error as e:
+            print(f"查询 {schema}.{table} 的主键失败（{e}），回滚语句按整行定位", file=sys.stderr)
+        primary_key = next((tuple(name for name, _ in columns) for columns in indexes.values()
+                            if not any(nullable == "YES" for _, nullable in columns)), None)
+        primary_key_cache[key] = primary_key
+        return primary_key
+
+
+# table-map 对应的渲染器缓存，DDL 之后 table_id 会变化，自动重新编译
+# 按 table_id 缓存的渲染器。DDL和表重新打开都会分配新的 table_id，--follow 长时间运行时
+# 只保留最近使用的 RENDERER_CACHE_SIZE 个，淘汰的表下次出现时重新生成
+RENDERER_CACHE_SIZE = 4096
+renderer_cache = OrderedDict()
+renderer_cache_lock = threading.Lock()
+
+
+def get_renderer(binlogevent, first_row):
+    key = (binlogevent.table_id, binlogevent.schema, binlogevent.table)
+    with renderer_cache_lock:
+        renderer = renderer_cache.get(key)
+        if renderer is not None:
+            renderer_cache.move_to_end(key)
+            return renderer
+
+    # 列名以解析出来的行数据为准（表结构元数据缺失时为 UNKNOWN_COL 占位名）
+    values = first_row["values"] if "values" in first_row else first_row["before_values"]
+    primary_key = binlogevent.primary_key
+    if not primary_key and primary_key_settings is not None:
+        primary_key = lookup_primary_key(binlogevent.schema, binlogevent.table)
+    renderer = TableRenderer(binlogevent.schema, binlogevent.table, list(values.keys()), binlogevent.columns,
+                             primary_key)
+    if row_predicate is not None:
+        renderer.row_filter = row_predicate.compile(renderer.column_names, binlogevent.columns)
+
+    with renderer_cache_lock:
+        renderer = renderer_cache.setdefault(key, renderer)
+        while len(renderer_cache) > RENDERER_CACHE_SIZE:
+            renderer_cache.popitem(last=False)
+    return renderer
+
+
+class RowCoalescer(object):
+    """
+    按主键合并同一行在时间范围内的多次修改。每张表维护一个 主键 -> 行状态 的哈希索引，
+    行状态记录窗口开始前的镜像（窗口内新插入的行为 None）和当前镜像（已删除为 None），
+    最后每行只生成一条回滚语句：恢复最早的镜像，或者删除窗口内新插入的行。
+    表结构元数据里没有主键、从 information_schema 也查不到主键或非空唯一索引时用整行作为键。
+    修改必须按binlog顺序调用 add()，行镜像需要是完整的（binlog_row_image=FULL），
+    check_binlog_settings 在其它取值下拒绝 --coalesce。
+    """
+
+    def __init__(self):
+        self.tables = {}
+        self.deleted = []
+
+    @staticmethod
+    def key(renderer, values):
+        literals = renderer.literals(values)
+        if renderer.key_indexes is None:
+            return tuple(literals)
+        return tuple([literals[i] for i in renderer.key_indexes])
+
+    def add(self, item):
+        renderer = item["renderer"]
+        index = self.tables.setdefault(renderer.table_name, {})
+        operation = item["operation"]
+
+        if operation == "insert":
+            row = {"before": None}
+        else:
+            row = index.pop(self.key(renderer, item["before"]), None)
+            if row is None:  # 窗口内第一次修改这一行，记录修改前的镜像
+                row = {"before": item["before"]}
+
+        row["renderer"] = renderer
+        row["current"] = item["after"]
+        row["changes"] = row.get("changes", 0) + 1
+        row["seq"] = item["seq"]
+        row["event_time"] = item["event_time"]
+
+        if operation == "delete":
+            self.deleted.append(row)
+            return
+
+        key = self.key(renderer, item["after"])
+        if key in index:  # 没有主键的表出现完全相同的行时，先到的行不再参与合并
+            self.deleted.append(index.pop(key))
+        index[key] = row
+
+    def results(self):
+        """
+        按每行最后一次修改的binlog顺序返回 (结果列表, replace结果列表)，
+        结果的格式和 process_binlogevent 放入队列的一致。
+        """
+        rows = self.deleted + [row for index in self.tables.values() for row in index.values()]
+        rows.sort(key=lambda row: row["seq"])
+
+        items = []
+        items_replace = []
+        for row in rows:
+            renderer = row["renderer"]
+            before = row["before"]
+            current = row["current"]
+            if before is None and current is None:  # 窗口内插入后又删除，无需回滚
+                continue
+            elif before is None:
+                sql, rollback_sql = renderer.render_insert(current)
+            elif current is None:
+                sql, rollback_sql = renderer.render_delete(before)
+            elif renderer.literals(before) == renderer.literals(current):  # 改了又改回原值
+                continue
+            else:
+                sql, rollback_sql, rollback_replace_sql = renderer.render_update(before, current)
+                items_replace.append({"event_time": row["event_time"], "seq": row["seq"], "trx": None,
+                                      "sql": f"(合并{row['changes']}次修改) {sql}",
+                                      "rollback_sql": rollback_replace_sql})
+            items.append({"event_time": row["event_time"], "seq": row["seq"], "trx": None,
+                          "sql": f"(合并{row['changes']}次修改) {sql}", "rollback_sql": rollback_sql})
+        return items, items_replace
+
+
+def process_binlogevent(binlogevent, start_time, end_time, seq=0, trx=None, coords=None):
+    """
+    seq 是事件在binlog中的顺序号，trx 是事件所属事务的 (事务序号, GTID)，
+    随结果一起放入队列，用于按binlog顺序排序和按事务分组输出。coords 是事件的 (binlog文件, 结束位置)。
+    """
+    if not (start_time <= binlogevent.timestamp <= end_time):
+        return
+
+    if isinstance(binlogevent, WriteRowsEvent):
+        operation = 'insert'
+    elif isinstance(binlogevent, UpdateRowsEvent):
+        operation = 'update'
+    elif isinstance(binlogevent, DeleteRowsEvent):
+        operation = 'delete'
+    else:
+        return
+
+    if only_operation and only_operation != operation:
+        return
+
+    rows = binlogevent.rows
+    if not rows:
+        return
+
+    event_time = binlogevent.timestamp
+    renderer = get_renderer(binlogevent, rows[0])
+
+    row_filter = renderer.row_filter
+    if row_filter is not None:
+        # --where 在解码后的行上求值，不满足条件的行不渲染SQL；update 修改前后任一镜像满足即可
+        if operation == 'update':
+            rows = [row for row in rows if row_filter(row["before_values"]) or row_filter(row["after_values"])]
+        else:
+            rows = [row for row in rows if row_filter(row["values"])]
+        if not rows:
+            return
+
+    if coalesce_rows:
+        # 合并模式下只放入行镜像，由主线程按binlog顺序交给 RowCoalescer
+        for i, row in enumerate(rows):
+            if operation == 'update':
+                before, after = row["before_values"], row["after_values"]
+            elif operation == 'insert':
+                before, after = None, row["values"]
+            else:
+                before, after = row["values"], None
+            result_queue.put({"event_time": event_time, "seq": (seq, i), "operation": operation,
+                              "renderer": renderer, "before": before, "after": after})
+        return
+
+    if output_format == "jsonl":
+        # JSON Lines 输出需要保留行镜像和binlog坐标
+        for i, row in enumerate(rows):
+            rollback_replace_sql = None
+            if operation == 'update':
+                before, after = row["before_values"], row["after_values"]
+                sql, rollback_sql, rollback_replace_sql = renderer.render_update(before, after,
+                                                                                 row.get("before_none_sources"),
+                                                                                 row.get("after_none_sources"))
+            elif operation == 'insert':
+                before, after = None, row["values"]
+                sql, rollback_sql = renderer.render_insert(after, row.get("none_sources"))
+            else:
+                before, after = row["values"], None
+                sql, rollback_sql = renderer.render_delete(before, row.get("none_sources"))
+            result_queue.put({"event_time": event_time, "seq": (seq, i), "trx": trx, "coords": coords,
+                              "operation": operation, "renderer": renderer, "before": before, "after": after,
+                              "sql": sql, "rollback_sql": rollback_sql, "rollback_replace_sql": rollback_replace_sql})
+        return
+
+    if operation == 'insert':
+        for i, row in enumerate(rows):
+            sql, rollback_sql = renderer.render_insert(row["values"], row.get("none_sources"))
+            result_queue.put({"event_time": event_time, "seq": (seq, i), "trx": trx,
+                              "sql": sql, "rollback_sql": rollback_sql})
+
+    elif operation == 'update':
+        for i, row in enumerate(rows):
+            sql, rollback_sql, rollback_replace_sql = renderer.render_update(row["before_values"],
+                                                                             row["after_values"],
+                                                                             row.get("before_none_sources"),
+                                                                             row.get("after_none_sources"))
+            result_queue.put({"event_time": event_time, "seq": (seq, i), "trx": trx,
+                              "sql": sql, "rollback_sql": rollback_sql})
+            result_queue_replace.put({"event_time": event_time, "seq": (seq, i), "trx": trx,
+                                      "sql": sql, "rollback_sql": rollback_replace_sql})
+
+    else:
+        for i, row in enumerate(rows):
+            sql, rollback_sql = renderer.render_delete(row["values"], row.get("none_sources"))
+            result_queue.put({"event_time": event_time, "seq": (seq, i), "trx": trx,
+                              "sql": sql, "rollback_sql": rollback_sql})
+
+
+# --profile 报告中各阶段的说明，按处理流程排列
+PROFILE_STAGES = [
+    ("read", "读取binlog（网络读取和事件头解析）"),
+    ("decode", "行数据解码（工作线程）"),
+    ("render", "SQL渲染（工作线程）"),
+    ("wait", "等待工作线程处理完"),
+    ("sort", "按binlog顺序排序"),
+    ("output", "编码结果并交给写入线程"),
+    ("writer_wait", "写入队列已满等待"),
+    ("compress", "压缩（写入线程）"),
+    ("disk", "写文件（写入线程）"),
+    ("close", "关闭文件（倒序拼接分段）"),
+]
+
+
+class StageProfiler(object):
+    """
+    --profile 的阶段计时器。每个阶段累计调用次数、墙钟时间和所在线程的CPU时间，
+    队列深度在每次写出时采样一次。计数只在少数几个位置累加，未开启时热点路径上只多一次 None 判断。
+    pstats_file 不为空时用 cProfile 统计主线程，stacks_file 不为空时由 StackSampler 采样所有线程的调用栈。
+    """
+
+    def __init__(self, pstats_file=None, stacks_file=None):
+        self.stages = {}
+        self.depths = {}
+        self.lock = threading.Lock()
+        self.started = time.perf_counter()
+        self.started_cpu = time.process_time()
+        self.pstats_file = pstats_file
+        self.cprofile = None
+        if pstats_file:
+            self.cprofile = cProfile.Profile()
+            self.cprofile.enable()
+        self.sampler = StackSampler(stacks_file) if stacks_file else None
+
+    @staticmethod
+    def clock():
+        return time.perf_counter(), time.thread_time()
+
+    def add(self, stage, start):
+        wall = time.perf_counter() - start[0]
+        cpu = time.thread_time() - start[1]
+        with self.lock:
+            counter = self.stages.setdefault(stage, [0, 0.0, 0.0])
+            counter[0] += 1
+            counter[1] += wall
+            counter[2] += cpu
+
+    @contextlib.contextmanager
+    def stage(self, stage):
+        start = self.clock()
+        try:
+            yield
+        finally:
+            self.add(stage, start)
+
+    def depth(self, name, value):
+        with self.lock:
+            counter = self.depths.setdefault(name, [0, 0, 0])
+            counter[0] += 1
+            counter[1] += value
+            counter[2] = max(counter[2], value)
+
+    def events(self, stream):
+        """逐个返回 stream 中的事件，统计等待下一个事件的时间"""
+        iterator = iter(stream)
+        while True:
+            start = self.clock()
+            try:
+                binlogevent = next(iterator)
+            except StopIteration:
+                return
+            self.add("read", start)
+            yield binlogevent
+
+    def process(self, binlogevent, *args):
+        """代替 process_binlogevent 提交给线程池，把行数据解码和SQL渲染分开计时"""
+        start = self.clock()
+        binlogevent.rows  # 行数据在第一次访问时才解码
+        self.add("decode", start)
+        start = self.clock()
+        process_binlogevent(binlogevent, *args)
+        self.add("render", start)
+
+    def report(self):
+        elapsed = time.perf_counter() - self.started
+        # 阶段说明是中文，放在最后一列，避免宽字符影响数字列对齐
+        lines = [f"\n{'calls':>10}{'wall(s)':>12}{'cpu(s)':>12}{'share':>8}  stage"]
+        names = [name for name, _ in PROFILE_STAGES] + sorted(set(self.stages) - {n for n, _ in PROFILE_STAGES})
+        descriptions = dict(PROFILE_STAGES)
+        for name in names:
+            if name not in self.stages:
+                continue
+            calls, wall, cpu = self.stages[name]
+            lines.append(f"{calls:>10,}{wall:>12.3f}{cpu:>12.3f}{wall / elapsed if elapsed else 0:>8.1%}"
+                         f"  {descriptions.get(name, name)}")
+        lines.append(f"总耗时 {elapsed:.3f}s，进程CPU {time.process_time() - self.started_cpu:.3f}s"
+                     f"（工作线程和写入线程的阶段与主线程并行，占比之和可能超过100%）")
+        for name, (samples, total, peak) in sorted(self.depths.items()):
+            lines.append(f"队列 {name}：采样 {samples} 次，平均深度 {total / samples:.1f}，最大深度 {peak}")
+        return "\n".join(lines)
+
+    def finish(self):
+        """停止采样，写出 pstats 和调用栈文件，并把阶段统计输出到标准错误"""
+        if self.cprofile is not None:
+            self.cprofile.disable()
+            self.cprofile.dump_stats(self.pstats_file)
+            print(f"cProfile 统计已写入 {self.pstats_file}，可用 python3 -m pstats 查看", file=sys.stderr)
+        if self.sampler is not None:
+            self.sampler.stop()
+            print(f"调用栈采样已写入 {self.sampler.filename}，可用 flamegraph.pl 或 speedscope 生成火焰图",
+                  file=sys.stderr)
+        print(self.report(), file=sys.stderr)
+
+
+class StackSampler(object):
+    """
+    按固定间隔采样所有线程的调用栈，结束时按 flamegraph.pl 的折叠格式写出：
+    每行为 "线程名;外层函数;...;内层函数 次数"。
+    """
+
+    def __init__(self, filename, interval=0.005):
+        self.filename = filename
+        self.interval = interval
+        self.counts = {}
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self._run, name="StackSampler", daemon=True)
+        self.thread.start()
+
+    def _run(self):
+        names = {}
+        while not self.stopped.wait(self.interval):
+            for thread in threading.enumerate():
+                names[thread.ident] = thread.name
+            for ident, frame in sys._current_frames().items():
+                if ident == self.thread.ident:
                     continue
-                else:
-                    sql = "DELETE FROM {} WHERE {};".format(
-                        f"`{database_name}`.`{binlogevent.table}`" if database_name else binlogevent.table,
-                        ' AND '.join(["`{}`={}".format(k, "'{}'".format(v) if isinstance(v, (str, datetime.datetime, datetime.date))
-                        else 'NULL' if v is None else str(v))
-                                      for k, v in row["values"].items()])
-                    )
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                stack.append(names.get(ident, str(ident)))
+                key = ";".join(reversed(stack))
+                self.counts[key] = self.counts.get(key, 0) + 1
+
+    def stop(self):
+        self.stopped.set()
+        self.thread.join()
+        with open(self.filename, "w") as f:
+            for stack, count in sorted(self.counts.items()):
+                f.write(f"{stack} {count}\n")
+
+
+def profile_stage(name):
+    """--profile 时统计代码块的耗时，未开启时什么都不做；只用在按分段执行的位置，不用在逐行的热点路径上"""
+    return profiler.stage(name) if profiler is not None else contextlib.nullcontext()
+
+
+def profile_events(stream):
+    """--profile 时统计读取每个事件的耗时"""
+    return profiler.events(stream) if profiler is not None else stream
+
+
+# 主循环每读取这么多个事件才更新一次进度，进度条最多每 PROGRESS_INTERVAL 秒刷新一次
+PROGRESS_EVENTS = 1000
+PROGRESS_INTERVAL = 0.5
+
+
+class BinlogProgress(object):
+    """
+    按binlog字节位置计算的进度条，整个运行只有一个。总量是起始位置到 last_file（默认最后一个文件）末尾的字节数，
+    取自 SHOW BINARY LOGS；按结束时间提前停止时进度不会到100%，剩余时间是按读完这些字节估算的上限。
+    主循环只在每 PROGRESS_EVENTS 个事件时调用 update，刷新频率由 tqdm 的 mininterval 限制。
+    """
+
+    def __init__(self, binary_logs, start_file, start_pos, last_file=None):
+        self.offsets = {}
+        total = 0
+        for name, size in binary_logs:
+            if name == start_file or self.offsets:
+                self.offsets[name] = total
+                total += size
+                if name == last_file:
+                    break
+        self.start_pos = start_pos
+        total -= start_pos
+        self.events = 0
+        self.rows = 0
+        self.started = time.time()
+        self.last_postfix = 0
+        # 起始文件不在 SHOW BINARY LOGS 中时不知道总量，只显示速度
+        self.bar = tqdm(total=total if total > 0 else None, desc='Processing binlog', unit='B', unit_scale=True,
+                        unit_divisor=1024, mininterval=PROGRESS_INTERVAL, leave=True)
+
+    def update(self, log_file, log_pos, events):
+        """events 是上次调用之后读取的事件数"""
+        self.events += events
+        now = time.time()
+        if now - self.last_postfix >= PROGRESS_INTERVAL:
+            elapsed = max(now - self.started, 1e-6)
+            self.bar.set_postfix_str(f"{self.events / elapsed:,.0f} events/s, {self.rows / elapsed:,.0f} rows/s",
+                                     refresh=False)
+            self.last_postfix = now
+        offset = self.offsets.get(log_file)
+        position = offset + log_pos - self.start_pos if offset is not None else self.bar.n
+        self.bar.update(max(position - self.bar.n, 0))
+
+    def add_rows(self, rows):
+        self.rows += rows
+
+    def close(self):
+        self.bar.close()
+
+
+COMPRESS_SUFFIX = {"gzip": ".gz", "zstd": ".zst"}
+
+OUTPUT_SUFFIX = {"sql": ".sql", "replace": "_replace.sql", "jsonl": ".jsonl"}
+
+# 攒够这么多字节再交给写入线程，避免每条记录都经过一次队列
+WRITE_CHUNK_SIZE = 1024 * 1024
+
+# 每个输出分段最多包含的行事件数，倒序输出时内存中只保留一个分段的结果
+SEGMENT_EVENTS = 2000
+
+# 写入线程队列中的分段结束标记
+SEGMENT_END = object()
+
+
+def make_compressor(compress):
+    if compress == "gzip":
+        # wbits=31 生成带gzip头的数据流，可以直接用 gunzip/zcat 解压
+        return zlib.compressobj(6, zlib.DEFLATED, 31)
+    elif compress == "zstd":
+        return zstandard.ZstdCompressor(level=3).compressobj()
+    return None
+
+
+class OutputWriter(object):
+    """
+    恢复文件的写入线程。主线程把编码好的数据块放入有界队列，由单独的线程完成压缩和写盘，
+    压缩与binlog解析并行进行；队列满时主线程阻塞等待，内存占用不会随文件大小增长。
+    filename 为 "-" 时写到标准输出，方便通过管道直接传到其它主机。
+
+    reverse=True 时按分段倒序输出：每个分段压缩后先追加到临时文件并记录偏移量，
+    关闭时再从后往前逐段拷贝到目标文件。每个分段是独立的gzip member或zstd frame，
+    倒序拼接后仍然可以直接解压。只有输出是普通文件时才这样做，临时文件放在同一目录下；
+    写到标准输出或管道时不落本地磁盘，按分段流式写出，这时只在每个分段内是倒序
+    （命令行需要 --allow-segment-order 才会这样输出SQL）。
+
+    写入线程出错（例如磁盘写满）时保存异常并继续取空队列，主线程不会阻塞在 put 上，
+    下一次调用 write/end_segment/checkpoint/close 时在主线程重新抛出该异常。
+    """
+
+    def __init__(self, filename, compress=None, reverse=False, queue_size=16):
+        if filename == "-":
+            self.target = sys.stdout.buffer
+            self.close_target = False
+            reverse = False
+        else:
+            self.target = open(filename, "ab")
+            self.close_target = True
+            if not stat.S_ISREG(os.fstat(self.target.fileno()).st_mode):  # 命名管道、设备文件等
+                reverse = False
+
+        self.filename = filename
+        self.compress = compress
+        self.compressor = make_compressor(compress)
+        self.reverse = reverse
+        self.bytes_written = 0
+        self.segments = []
+        self.segment_start = 0
+        self.error = None
+        self.file = tempfile.TemporaryFile(dir=os.path.dirname(os.path.abspath(filename))) if reverse else self.target
+
+        self.queue = Queue(maxsize=queue_size)
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def _check(self):
+        if self.error is not None:
+            raise self.error
+
+    def write(self, data):
+        self._check()
+        if profiler is not None:
+            # 队列满时主线程在这里阻塞，说明压缩或写盘跟不上解析
+            profiler.depth("writer_queue", self.queue.qsize())
+            start = profiler.clock()
+            self.queue.put(data)
+            profiler.add("writer_wait", start)
+        else:
+            self.queue.put(data)
+
+    def end_segment(self):
+        self._check()
+        self.queue.put(SEGMENT_END)
+
+    def checkpoint(self, callback):
+        """队列中在此之前的数据都写入文件后，在写入线程中调用 callback"""
+        self._check()
+        self.queue.put(callback)
+
+    def _sync(self):
+        # 把压缩器中缓存的数据刷到文件里，之后还可以继续压缩
+        if self.compressor is not None and not self.reverse:
+            if self.compress == "gzip":
+                data = self.compressor.flush(zlib.Z_SYNC_FLUSH)
+            else:
+                data = self.compressor.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+            self.file.write(data)
+            self.bytes_written += len(data)
+        self.file.flush()
+
+    def _end_segment(self):
+        if not self.reverse:
+            return
+        if self.compressor is not None:
+            self.file.write(self.compressor.flush())
+            self.compressor = make_compressor(self.compress)
+        end = self.file.tell()
+        if end > self.segment_start:
+            self.segments.append((self.segment_start, end))
+        self.segment_start = end
+
+    def _handle(self, data):
+        if data is SEGMENT_END:
+            self._end_segment()
+            return
+        if callable(data):
+            self._sync()
+            data()
+            return
+        if self.compressor is not None:
+            if profiler is not None:
+                start = profiler.clock()
+                data = self.compressor.compress(data)
+                profiler.add("compress", start)
+            else:
+                data = self.compressor.compress(data)
+        if data:
+            if profiler is not None:
+                start = profiler.clock()
+                self.file.write(data)
+                profiler.add("disk", start)
+            else:
+                self.file.write(data)
+            self.bytes_written += len(data)
+
+    def _run(self):
+        while True:
+            data = self.queue.get()
+            if data is None:
+                break
+            if self.error is not None:  # 已经出错，只取出数据丢弃，避免主线程阻塞
+                continue
+            try:
+                self._handle(data)
+            except Exception as e:
+                self.error = e
+        if self.error is not None:
+            return
+        try:
+            if self.reverse:
+                self._end_segment()
+            elif self.compressor is not None:
+                self.file.write(self.compressor.flush())
+            self.file.flush()
+        except Exception as e:
+            self.error = e
+
+    def close(self):
+        self.queue.put(None)
+        self.thread.join()
+        if self.error is not None:
+            if self.reverse:
+                self.file.close()
+            if self.close_target:
+                try:
+                    self.target.close()
+                except OSError:
+                    pass  # 缓冲区里的数据同样写不进去，抛出第一次出错的异常
+            raise self.error
+        if self.reverse:
+            for start, end in reversed(self.segments):
+                self.file.seek(start)
+                remaining = end - start
+                while remaining > 0:
+                    data = self.file.read(min(remaining, WRITE_CHUNK_SIZE))
+                    self.target.write(data)
+                    remaining -= len(data)
+            self.file.close()
+            self.target.flush()
+        if self.close_target:
+            self.target.close()
+
+
+def write_results(items, writer, print_output=False):
+    """
+    将解析结果交给写入线程。每条记录编码一次，攒成较大的数据块后再放入队列。
+    """
+    chunk = []
+    chunk_size = 0
+    for item in items:
+        dt = datetime.datetime.fromtimestamp(item["event_time"], tz=timezone)
+        current_time = dt.strftime('%Y-%m-%d %H:%M:%S')
 
-                    rollback_sql = "INSERT INTO {}({}) VALUES ({});".format(
-                        f"`{database_name}`.`{binlogevent.table}`" if database_name else binlogevent.table,
-                        '`' + '`,`'.join(list(row["values"].keys())) + '`',
-                        ','.join(["'%s'" % str(i) if isinstance(i, (
-                        str, datetime.datetime, datetime.date)) else 'NULL' if i is None else str(i)
-                                  for i in list(row["values"].values())])
-                    )
+        sql = item["sql"]
+        rollback_sql = item["rollback_sql"]
 
-                    result_queue.put({"event_time": event_time, "sql": sql, "rollback_sql": rollback_sql})
+        if print_output:
+            print(
+                f"-- SQL执行时间:{current_time} \n-- 原生sql:\n \t-- {sql} \n-- 回滚sql:\n \t{rollback_sql}\n-- ----------------------------------------------------------\n")
+
+        block = (f"-- SQL执行时间:{current_time}\n"
+                 f"-- 原生sql:\n \t-- {sql}\n"
+                 f"-- 回滚sql:\n \t{rollback_sql}\n"
+                 "-- ----------------------------------------------------------\n").encode("utf-8", "surrogateescape")
+        chunk.append(block)
+        chunk_size += len(block)
+        if chunk_size >= WRITE_CHUNK_SIZE:
+            writer.write(b"".join(chunk))
+            chunk = []
+            chunk_size = 0
+    if chunk:
+        writer.write(b"".join(chunk))
+
+
+def write_trx_results(items, writer, print_output=False):
+    """
+    按原事务分组输出回滚SQL：事务按倒序排列，事务内的语句也按倒序排列，每个事务用 BEGIN/COMMIT 包裹，
+    并注明原事务的GTID，可以整批执行，而不是每行自动提交一次。items 需要已按 seq 排序。
+    """
+    groups = []
+    for item in items:
+        if groups and groups[-1][0]["trx"] == item["trx"]:
+            groups[-1].append(item)
+        else:
+            groups.append([item])
+
+    chunk = []
+    chunk_size = 0
+    for group in reversed(groups):
+        trx = group[0]["trx"]
+        gtid = trx[1] if trx and trx[1] else "无GTID"
+        dt = datetime.datetime.fromtimestamp(group[0]["event_time"], tz=timezone)
+        current_time = dt.strftime('%Y-%m-%d %H:%M:%S')
 
+        lines = [f"-- 原事务GTID:{gtid}  SQL执行时间:{current_time}  语句数:{len(group)}", "BEGIN;"]
+        for item in reversed(group):
+            lines.append(f"-- 原生sql: {item['sql']}")
+            lines.append(item["rollback_sql"])
+        lines.append("COMMIT;")
+        lines.append("-- ----------------------------------------------------------\n")
+        text = "\n".join(lines)
 
-def main(only_tables=None, only_operation=None, mysql_host=None, mysql_port=None, mysql_user=None, mysql_passwd=None,
+        if print_output:
+            print(text)
+
+        block = text.encode("utf-8", "surrogateescape")
+        chunk.append(block)
+        chunk_size += len(block)
+        if chunk_size >= WRITE_CHUNK_SIZE:
+            writer.write(b"".join(chunk))
+            chunk = []
+            chunk_size = 0
+    if chunk:
+        writer.write(b"".join(chunk))
+
+
+def write_jsonl_results(items, writer, seen_tables, print_output=False):
+    """
+    以 JSON Lines 格式写出解析结果，按binlog顺序逐段写出，下游不必等整个任务结束就可以消费。
+    每张表第一次出现时先写一条 table 记录，描述列名、列类型和主键；之后每行一条 row 记录，
+    带binlog坐标、GTID、按类型转换的修改前后镜像和生成的SQL。
+    seen_tables 超过 RENDERER_CACHE_SIZE 时清空，之后出现的表重新写一次 table 记录。
+    """
+    chunk = []
+    chunk_size = 0
+    for item in items:
+        renderer = item["renderer"]
+        lines = []
+        if renderer not in seen_tables:
+            if len(seen_tables) >= RENDERER_CACHE_SIZE:
+                seen_tables.clear()
+            seen_tables.add(renderer)
+            lines.append({
+                "type": "table", "schema": renderer.schema, "table": renderer.table,
+                "columns": [{"name": name, "type": FIELD_TYPE_NAMES.get(column.type, column.type),
+                             "unsigned": bool(getattr(column, "unsigned", False))}
+                            for name, column in zip(renderer.column_names, renderer.columns)],
+                "primary_key": None if renderer.key_indexes is None else
+                [renderer.column_names[i] for i in renderer.key_indexes]
+            })
+
+        coords = item["coords"] or (None, None)
+        trx = item["trx"]
+        before = item["before"]
+        after = item["after"]
+        record = {
+            "type": "row", "schema": renderer.schema, "table": renderer.table, "operation": item["operation"],
+            "event_time": item["event_time"],
+            "time": datetime.datetime.fromtimestamp(item["event_time"], tz=timezone).isoformat(),
+            "binlog_file": coords[0], "log_pos": coords[1], "row": item["seq"][1],
+            "gtid": trx[1] if trx else None,
+            "before": None if before is None else {k: json_value(v) for k, v in before.items()},
+            "after": None if after is None else {k: json_value(v) for k, v in after.items()},
+            "sql": item["sql"], "rollback_sql": item["rollback_sql"]
+        }
+        if item["rollback_replace_sql"] is not None:
+            record["rollback_replace_sql"] = item["rollback_replace_sql"]
+        lines.append(record)
+
+        text = "".join([json.dumps(line, ensure_ascii=False, default=str) + "\n" for line in lines])
+        if print_output:
+            print(text, end="")
+
+        block = text.encode("utf-8", "surrogateescape")
+        chunk.append(block)
+        chunk_size += len(block)
+        if chunk_size >= WRITE_CHUNK_SIZE:
+            writer.write(b"".join(chunk))
+            chunk = []
+            chunk_size = 0
+    if chunk:
+        writer.write(b"".join(chunk))
+
+
+class TrxTracker(object):
+    """
+    根据 GTID、BEGIN 和提交事件跟踪行事件所属的事务。trx 为当前事务的 (事务序号, GTID)，
+    未开启GTID时 GTID 为 None；open 表示当前事务还没有提交。
+    """
+
+    def __init__(self):
+        self.seq = 0
+        self.trx = None
+        self.open = False
+        self.gtid_pending = False
+
+    def feed(self, binlogevent):
+        """处理事务边界事件并返回 True，其它事件返回 False"""
+        if isinstance(binlogevent, GtidEvent):
+            # GTID事件之后紧跟着该事务的 BEGIN
+            self.seq += 1
+            self.trx = (self.seq, binlogevent.gtid)
+            self.open = True
+            self.gtid_pending = True
+        elif isinstance(binlogevent, QueryEvent):
+            if binlogevent.query == "BEGIN":
+                if not self.gtid_pending:  # 未开启GTID时以 BEGIN 作为事务的开始
+                    self.seq += 1
+                    self.trx = (self.seq, None)
+                self.open = True
+                self.gtid_pending = False
+            elif binlogevent.query == "COMMIT":  # 非事务引擎以 COMMIT 语句结束事务
+                self.open = False
+        elif isinstance(binlogevent, XidEvent):
+            self.open = False
+        else:
+            return False
+        return True
+
+
+def drain_queue(queue):
+    items = []
+    while not queue.empty():
+        items.append(queue.get())
+    return items
+
+
+def main(only_tables=None, only_schemas=None, only_operation=None, mysql_host=None, mysql_port=None, mysql_user=None, mysql_passwd=None,
          mysql_database=None, mysql_charset=None, binlog_file=None, binlog_pos=None, st=None, et=None, max_workers=None,
-         print_output=False, replace_output=False):
+         print_output=False, replace_output=False, output=None, compress=None, group_trx=False):
     valid_operations = ['insert', 'delete', 'update']
 
     if only_operation:
@@ -202,10 +1679,118 @@ def main(only_tables=None, only_operation=None, mysql_host=None, mysql_port=None
         "charset": mysql_charset
     }
 
+    table_filter = TableFilter(only_schemas, only_tables)
+
     start_time = int(time.mktime(time.strptime(st, '%Y-%m-%d %H:%M:%S')))
     end_time = int(time.mktime(time.strptime(et, '%Y-%m-%d %H:%M:%S')))
 
+    # 没有指定 --binlog-file 时按时间范围自动定位binlog文件，读完最后一个文件就结束
+    try:
+        binary_logs = list_binary_logs(source_mysql_settings)
+    except pymysql.err.Error as e:
+        # 指定了 --binlog-file 时文件列表只用来显示进度，没有 REPLICATION CLIENT 权限也可以继续
+        if binlog_file is None:
+            exit(f"\n按时间范围定位binlog文件需要执行 SHOW BINARY LOGS：{e}，请授予 REPLICATION CLIENT 权限或指定 --binlog-file\n")
+        print(f"无法执行 SHOW BINARY LOGS（{e}），进度条只显示处理速度", file=sys.stderr)
+        binary_logs = []
+    covered_files = None
+    last_file = None
+    if binlog_file is None:
+        covered_files = find_binlog_files(source_mysql_settings, [name for name, _ in binary_logs],
+                                          start_time, end_time)
+        binlog_file, binlog_pos = covered_files[0], 4
+        last_file = covered_files[-1]
+        print(f"按时间范围定位到的binlog文件：{', '.join(covered_files)}")
+        covered_files = set(covered_files)
+
+    c_time = datetime.datetime.now()
+    formatted_time = c_time.strftime("%Y-%m-%d_%H:%M:%S")
+    suffix = COMPRESS_SUFFIX.get(compress, "")
+    writers = {}
+
+    def get_writer(kind, binlogevent):
+        # 文件名沿用第一批结果对应的库表名，第一次有结果要写时才创建
+        if kind not in writers:
+            if output == "-":
+                filename = "-"
+            elif output:
+                filename = f"{output}_replace" if kind == "replace" else output
+            else:
+                filename = f"{binlogevent.schema}_{binlogevent.table}_recover_{formatted_time}"
+                filename += OUTPUT_SUFFIX[kind] + suffix
+            # JSON Lines 每条记录都带回滚SQL，按binlog顺序增量写出，不需要倒序
+            writers[kind] = OutputWriter(filename, compress, reverse=(kind != "jsonl"))
+        return writers[kind]
+
+    def flush_results(tasks, binlogevent, final=False):
+        """
+        等待已提交的事件处理完，按binlog顺序排序后倒序写成一个分段。写入线程最后再把分段倒序拼接，
+        整个文件就是严格的binlog倒序：先撤销最新的修改，再撤销更早的修改。
+        """
+        with profile_stage("wait"):
+            wait(tasks)
+
+        if profiler is not None:
+            profiler.depth("result_queue", result_queue.qsize())
+        with profile_stage("sort"):
+            sorted_array = sorted(drain_queue(result_queue), key=lambda x: x["seq"])
+        progress.add_rows(len(sorted_array))
+        with profile_stage("output"):
+            write_sorted(sorted_array, binlogevent, final)
+
+    def write_sorted(sorted_array, binlogevent, final):
+        """把排好序的一批结果交给合并器或写入线程"""
+        if coalesce_rows:
+            for item in sorted_array:
+                coalescer.add(item)
+            return
+
+        if output_format == "jsonl":
+            drain_queue(result_queue_replace)
+            if sorted_array:
+                write_jsonl_results(sorted_array, get_writer("jsonl", binlogevent), seen_tables, print_output)
+            return
+
+        sorted_array_replace = sorted(drain_queue(result_queue_replace), key=lambda x: x["seq"])
+        if not replace_output:
+            sorted_array_replace = []
+
+        for kind, items in (("sql", sorted_array), ("replace", sorted_array_replace)):
+            if group_trx:
+                # 分段在事务中间结束时，未提交事务的语句留到下一个分段，避免同一事务被拆成两组
+                items = carry[kind] + items
+                carry[kind] = []
+                if trx_tracker.open and not final:
+                    while items and items[-1]["trx"] == trx_tracker.trx:
+                        carry[kind].append(items.pop())
+                    carry[kind].reverse()
+            if not items:
+                continue
+
+            # update 转换为 replace 时写入 _replace 文件
+            writer = get_writer(kind, binlogevent)
+            if group_trx:
+                write_trx_results(items, writer, print_output)
+            else:
+                write_results(reversed(items), writer, print_output)
+            writer.end_segment()
+
+    process = profiler.process if profiler is not None else process_binlogevent
+
+    # 按事务分组或输出 JSON Lines 时需要事务边界事件：GTID、BEGIN 和提交事件
+    only_events = [WriteRowsEvent, UpdateRowsEvent, DeleteRowsEvent]
+    if group_trx or output_format == "jsonl":
+        only_events += [GtidEvent, QueryEvent, XidEvent]
+    carry = {"sql": [], "replace": []}
+
+    coalescer = RowCoalescer()
+    seen_tables = set()
+    binlogevent = None
+    event_seq = 0
+    trx_tracker = TrxTracker()
+
     interval = (end_time - start_time) // max_workers  # 将时间范围划分为 10 等份
+    progress = BinlogProgress(binary_logs, binlog_file, int(binlog_pos), last_file)
     executor = ThreadPoolExecutor(max_workers=max_workers)
 
     stream = BinLogStreamReader(
@@ -213,10 +1798,11 @@ def main(only_tables=None, only_operation=None, mysql_host=None, mysql_port=None
         server_id=1234567890,
         blocking=False,
         resume_stream=True,
-        only_events=[WriteRowsEvent, UpdateRowsEvent, DeleteRowsEvent],
+        only_events=only_events,
         log_file=binlog_file,
         log_pos=int(binlog_pos),
-        only_tables=only_tables
+        only_schemas=table_filter.stream_schemas,
+        only_tables=table_filter.stream_tables
     )
 
     next_binlog_file = binlog_file
@@ -233,22 +1819,29 @@ def main(only_tables=None, only_operation=None, mysql_host=None, mysql_port=None
             task_end_time = end_time
 
         tasks = []
+        event_count = 0  # 上次更新进度之后读取的事件数
 
-        # 创建进度条对象
-        progress_bar = tqdm(desc='Processing binlogevents', unit='event', leave=True)
-
-        event_count = 0  # 初始化事件计数器
+        for binlogevent in profile_events(stream):
+            event_count += 1
+            if event_count >= PROGRESS_EVENTS:
+                progress.update(stream.log_file, stream.log_pos, event_count)
+                event_count = 0
 
-        for binlogevent in stream:
-            event_count += 1  # 每迭代一次，计数器加一
-            # 更新进度条
-            progress_bar.update(1)
-        #for binlogevent in tqdm(stream, desc='Processing binlogevents', unit='event'):
-            if binlogevent.timestamp < task_start_time:  # 如果事件的时间小于任务的起始时间，则继续迭代下一个事件
-                continue
-            elif binlogevent.timestamp > task_end_time:  # 如果事件的时间大于任务的结束时间，则结束该任务的迭代
+            if binlogevent.timestamp > task_end_time:  # 如果事件的时间大于任务的结束时间，则结束该任务的迭代
+                break
+            elif covered_files is not None and stream.log_file not in covered_files:  # 已经超出时间范围内的文件
                 break
-            task = executor.submit(process_binlogevent, binlogevent, task_start_time, task_end_time)
+            elif trx_tracker.feed(binlogevent):  # 事务边界事件
+                pass
+            elif binlogevent.timestamp < task_start_time:  # 如果事件的时间小于任务的起始时间，则继续迭代下一个事件
+                continue
+            elif table_filter.match(binlogevent.schema, binlogevent.table):  # 按库名和表名的组合精确过滤
+                event_seq += 1
+                tasks.append(executor.submit(process, binlogevent, task_start_time, task_end_time,
+                                             event_seq, trx_tracker.trx, (stream.log_file, binlogevent.packet.log_pos)))
+                if len(tasks) >= SEGMENT_EVENTS:
+                    flush_results(tasks, binlogevent)
+                    tasks = []
 
             with next_binlog_file_lock:
                 if stream.log_file > next_binlog_file:
@@ -264,12 +1857,11 @@ def main(only_tables=None, only_operation=None, mysql_host=None, mysql_port=None
             with next_binlog_pos_lock:
                 next_binlog_pos = stream.log_pos
             """
-            tasks.append(task)
 
-            # 刷新进度条显示
-            progress_bar.refresh()
+        progress.update(stream.log_file, stream.log_pos, event_count)
 
-        wait(tasks)
+        # 每个时间分片处理完就写出剩余的结果，写入线程压缩上一分段时主线程继续解析下一分片
+        flush_results(tasks, binlogevent, final=(i == max_workers - 1))
 
         stream.close()
 
@@ -278,87 +1870,185 @@ def main(only_tables=None, only_operation=None, mysql_host=None, mysql_port=None
             server_id=1234567890,
             blocking=False,
             resume_stream=True,
-            only_events=[WriteRowsEvent, UpdateRowsEvent, DeleteRowsEvent],
+            only_events=only_events,
             log_file=next_binlog_file,
             log_pos=int(next_binlog_pos),
-            only_tables=only_tables
+            only_schemas=table_filter.stream_schemas,
+            only_tables=table_filter.stream_tables
         )
 
-        # 设置进度条的总长度为事件计数器的值
-        progress_bar.total = event_count
-
-        # 完成后关闭进度条
-        progress_bar.close()
+    progress.close()
 
-    while not result_queue.empty():
-        combined_array.append(result_queue.get())
+    if coalesce_rows:
+        # 合并后的结果按每行最后一次修改的顺序排列，分段倒序写出
+        sorted_array, sorted_array_replace = coalescer.results()
+        if not replace_output:
+            sorted_array_replace = []
+        for kind, items in (("sql", sorted_array), ("replace", sorted_array_replace)):
+            for start in range(0, len(items), SEGMENT_EVENTS):
+                writer = get_writer(kind, binlogevent)
+                write_results(reversed(items[start:start + SEGMENT_EVENTS]), writer, print_output)
+                writer.end_segment()
 
-    while not result_queue_replace.empty():
-        combined_array_replace.append(result_queue_replace.get())
+    with profile_stage("close"):
+        for writer in writers.values():
+            writer.close()
 
-    sorted_array = sorted(combined_array, key=lambda x: x["event_time"])
-    sorted_array_replace = sorted(combined_array_replace, key=lambda x: x["event_time"])
-
-    c_time = datetime.datetime.now()
-    formatted_time = c_time.strftime("%Y-%m-%d_%H:%M:%S")
+    stream.close()
+    executor.shutdown()
 
-    for item in sorted_array:
-        event_time = item["event_time"]
-        dt = datetime.datetime.fromtimestamp(event_time, tz=timezone)
-        current_time = dt.strftime('%Y-%m-%d %H:%M:%S')
 
-        sql = item["sql"]
-        rollback_sql = item["rollback_sql"]
+def save_position(filename, position):
+    # 先写临时文件再改名，进程中途退出也不会留下写了一半的位置文件
+    with open(filename + ".tmp", "w") as f:
+        json.dump({"log_file": position[0], "log_pos": position[1]}, f)
+    os.replace(filename + ".tmp", filename)
+
+
+def follow(only_tables=None, only_schemas=None, mysql_host=None, mysql_port=None, mysql_user=None, mysql_passwd=None,
+           mysql_database=None, mysql_charset=None, binlog_file=None, binlog_pos=None, st=None, max_workers=None,
+           print_output=False, output=None, compress=None, rotate_size=256, keep_files=0):
+    """
+    --follow 持续跟踪模式：保持一个阻塞的复制连接，把匹配表的行事件不断转换为原生SQL和回滚SQL，
+    按binlog顺序写入按大小滚动的文件，出事时需要的回滚语句已经在磁盘上了，不必临时重新解析binlog。
+    每攒够一个分段，或者主库空闲时（心跳事件）写出一次；正在处理的事件数和写入队列都有上限，
+    磁盘跟不上时读取binlog会被阻塞，内存不会无限增长。
+    每次写出后把最后一个已提交事务的binlog位置记录到 {前缀}.pos，重启后从该位置继续，
+    未提交完的事务会重新输出一次。
+    """
+    source_mysql_settings = {
+        "host": mysql_host,
+        "port": mysql_port,
+        "user": mysql_user,
+        "passwd": mysql_passwd,
+        "database": mysql_database,
+        "charset": mysql_charset
+    }
 
-        if print_output:
-            print(
-                f"-- SQL执行时间:{current_time} \n-- 原生sql:\n \t-- {sql} \n-- 回滚sql:\n \t{rollback_sql}\n-- ----------------------------------------------------------\n")
+    table_filter = TableFilter(only_schemas, only_tables)
+    start_time = int(time.mktime(time.strptime(st, '%Y-%m-%d %H:%M:%S'))) if st else 0
+    kind = "jsonl" if output_format == "jsonl" else "sql"
+    prefix = output if output and output != "-" else "reverse_sql_follow"
+    position_file = prefix + ".pos"
+
+    if os.path.exists(position_file):
+        with open(position_file) as f:
+            position = json.load(f)
+        binlog_file, binlog_pos = position["log_file"], position["log_pos"]
+        print(f"从 {position_file} 记录的位置继续：{binlog_file}:{binlog_pos}", file=sys.stderr)
+
+    writer = None
+    finished_files = []
+    file_count = 0
+
+    def get_writer():
+        nonlocal writer, file_count
+        if writer is None:
+            if output == "-":
+                filename = "-"
+            else:
+                file_count += 1
+                filename = (f"{prefix}_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}_{file_count:04d}"
+                            f"{OUTPUT_SUFFIX[kind]}{COMPRESS_SUFFIX.get(compress, '')}")
+            writer = OutputWriter(filename, compress)
+        return writer
+
+    def rotate():
+        nonlocal writer
+        writer.close()
+        finished_files.append(writer.filename)
+        writer = None
+        # 每个文件都从 table 记录开始，可以单独解析
+        seen_tables.clear()
+        # 只保留最近的 keep_files 个文件
+        while keep_files and len(finished_files) > keep_files:
+            os.remove(finished_files.pop(0))
+
+    def flush_results(tasks, position):
+        with profile_stage("wait"):
+            wait(tasks)
+        if profiler is not None:
+            profiler.depth("result_queue", result_queue.qsize())
+        with profile_stage("sort"):
+            items = sorted(drain_queue(result_queue), key=lambda x: x["seq"])
+            drain_queue(result_queue_replace)
+        if items:
+            with profile_stage("output"):
+                if kind == "jsonl":
+                    write_jsonl_results(items, get_writer(), seen_tables, print_output)
+                else:
+                    write_results(items, get_writer(), print_output)
+        if position is not None:
+            if writer is not None:
+                writer.checkpoint(lambda: save_position(position_file, position))
+            else:
+                save_position(position_file, position)
+        if writer is not None and output != "-" and writer.bytes_written >= rotate_size * 1024 * 1024:
+            rotate()
 
-        # 写入文件
-        filename = f"{binlogevent.schema}_{binlogevent.table}_recover_{formatted_time}.sql"
-        # filename = f"{binlogevent.schema}_{binlogevent.table}_recover.sql"
-        with file_lock:  # 获取文件锁
-            with open(filename, "a", encoding="utf-8") as file:
-                file.write(f"-- SQL执行时间:{current_time}\n")
-                file.write(f"-- 原生sql:\n \t-- {sql}\n")
-                file.write(f"-- 回滚sql:\n \t{rollback_sql}\n")
-                file.write("-- ----------------------------------------------------------\n")
-
-    if replace_output:
-        # update 转换为 replace
-        for item in sorted_array_replace:
-            event_time = item["event_time"]
-            dt = datetime.datetime.fromtimestamp(event_time, tz=timezone)
-            current_time = dt.strftime('%Y-%m-%d %H:%M:%S')
-
-            sql = item["sql"]
-            rollback_sql = item["rollback_sql"]
-
-            if print_output:
-                print(
-                    f"-- SQL执行时间:{current_time} \n-- 原生sql:\n \t-- {sql} \n-- 回滚sql:\n \t{rollback_sql}\n-- ----------------------------------------------------------\n")
-
-            # 写入文件
-            filename = f"{binlogevent.schema}_{binlogevent.table}_recover_{formatted_time}_replace.sql"
-            # filename = f"{binlogevent.schema}_{binlogevent.table}_recover.sql"
-            with file_lock:  # 获取文件锁
-                with open(filename, "a", encoding="utf-8") as file:
-                    file.write(f"-- SQL执行时间:{current_time}\n")
-                    file.write(f"-- 原生sql:\n \t-- {sql}\n")
-                    file.write(f"-- 回滚sql:\n \t{rollback_sql}\n")
-                    file.write("-- ----------------------------------------------------------\n")
+    executor = ThreadPoolExecutor(max_workers=max_workers)
+    process = profiler.process if profiler is not None else process_binlogevent
+    trx_tracker = TrxTracker()
+    seen_tables = set()
+    tasks = []
+    event_seq = 0
+    committed = None
+    last_flush = time.time()
+
+    # 与时间范围模式使用不同的 server_id，两者可以同时运行
+    stream = BinLogStreamReader(
+        connection_settings=source_mysql_settings,
+        server_id=1234567891,
+        blocking=True,
+        resume_stream=True,
+        slave_heartbeat=1,
+        only_events=[WriteRowsEvent, UpdateRowsEvent, DeleteRowsEvent, GtidEvent, QueryEvent, XidEvent,
+                     HeartbeatLogEvent],
+        log_file=binlog_file,
+        log_pos=int(binlog_pos),
+        only_schemas=table_filter.stream_schemas,
+        only_tables=table_filter.stream_tables
+    )
 
-    stream.close()
-    executor.shutdown()
+    try:
+        for binlogevent in profile_events(stream):
+            if isinstance(binlogevent, HeartbeatLogEvent):
+                pass
+            elif trx_tracker.feed(binlogevent):
+                if not trx_tracker.open:
+                    committed = (stream.log_file, binlogevent.packet.log_pos)
+            elif binlogevent.timestamp >= start_time and table_filter.match(binlogevent.schema, binlogevent.table):
+                event_seq += 1
+                tasks.append(executor.submit(process, binlogevent, 0, sys.maxsize, event_seq,
+                                             trx_tracker.trx, (stream.log_file, binlogevent.packet.log_pos)))
+
+            if len(tasks) >= SEGMENT_EVENTS or (time.time() - last_flush >= 1 and (tasks or committed)):
+                flush_results(tasks, committed)
+                tasks = []
+                committed = None
+                last_flush = time.time()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        flush_results(tasks, committed)
+        if writer is not None:
+            writer.close()
+        stream.close()
+        executor.shutdown()
 
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Binlog数据恢复，生成反向SQL语句。", epilog=r"""
 Example usage:
     shell> ./reverse_sql -ot table1 -op delete -H 192.168.198.239 -P 3336 -u admin -p hechunyang -d hcy \
-            --binlog-file mysql-bin.000124 --start-time "2023-07-06 10:00:00" --end-time "2023-07-06 22:00:00" """,
+            --binlog-file mysql-bin.000124 --start-time "2023-07-06 10:00:00" --end-time "2023-07-06 22:00:00"
+    shell> ./reverse_sql -ot table1 -op delete -H 192.168.198.239 -P 3336 -u admin -p hechunyang -d hcy \
+            --start-time "2023-07-06 10:00:00" --end-time "2023-07-06 22:00:00" """,
                                      formatter_class=argparse.RawTextHelpFormatter)
-    parser.add_argument("-ot", "--only-tables", dest="only_tables", nargs="+", type=str, help="设置要恢复的表，多张表用,逗号分隔")
+    parser.add_argument("-ot", "--only-tables", dest="only_tables", nargs="+", type=str,
+                        help="设置要恢复的表，多张表用,逗号分隔，可以写成 schema.table，库名和表名支持 * ? 通配符")
+    parser.add_argument("-os", "--only-schemas", dest="only_schemas", nargs="+", type=str,
+                        help="设置要恢复的库，多个库用,逗号分隔，支持 * ? 通配符")
     parser.add_argument("-op", "--only-operation", dest="only_operation", type=str,
                         help="设置误操作时的命令（insert/update/delete）")
     parser.add_argument("-H", "--mysql-host", dest="mysql_host", type=str, help="MySQL主机名", required=True)
@@ -367,49 +2057,179 @@ Example usage:
     parser.add_argument("-p", "--mysql-passwd", dest="mysql_passwd", type=str, help="MySQL密码", required=True)
     parser.add_argument("-d", "--mysql-database", dest="mysql_database", type=str, help="MySQL数据库名", required=True)
     parser.add_argument("-c", "--mysql-charset", dest="mysql_charset", type=str, default="utf8", help="MySQL字符集，默认utf8")
-    parser.add_argument("--binlog-file", dest="binlog_file", type=str, help="Binlog文件", required=True)
+    parser.add_argument("--binlog-file", dest="binlog_file", type=str,
+                        help="Binlog文件，不指定时根据 SHOW BINARY LOGS 按 --start-time/--end-time 自动定位（--follow 模式下必须指定）")
     parser.add_argument("--binlog-pos", dest="binlog_pos", type=int, default=4, help="Binlog位置，默认4")
-    parser.add_argument("--start-time", dest="st", type=str, help="起始时间", required=True)
-    parser.add_argument("--end-time", dest="et", type=str, help="结束时间", required=True)
+    parser.add_argument("--start-time", dest="st", type=str, help="起始时间，--follow 模式下可选")
+    parser.add_argument("--end-time", dest="et", type=str, help="结束时间，--follow 模式下不需要")
     parser.add_argument("--max-workers", dest="max_workers", type=int, default=4, help="线程数，默认4（并发越高，锁的开销就越大，适当调整并发数）")
     parser.add_argument("--print", dest="print_output", action="store_true", help="将解析后的SQL输出到终端")
     parser.add_argument("--replace", dest="replace_output", action="store_true", help="将update转换为replace操作")
+    parser.add_argument("--binary-as-hex", dest="binary_as_hex", action="store_true",
+                        help="二进制和BLOB/TEXT列的值直接输出为十六进制字面量，不做文本转义和编码转换")
+    parser.add_argument("--group-by-trx", dest="group_trx", action="store_true",
+                        help="按原事务分组输出回滚SQL，事务倒序排列，用 BEGIN/COMMIT 包裹并注明GTID")
+    parser.add_argument("--where", dest="where", type=str,
+                        help="按列值过滤行，语法与SQL的WHERE子句类似，例如 \"tenant_id=42 AND status IN (1,2)\"，\n"
+                             "支持 = != <> < <= > >= IS [NOT] NULL、[NOT] IN、[NOT] LIKE、[NOT] BETWEEN、AND/OR/NOT")
+    parser.add_argument("--coalesce", dest="coalesce_rows", action="store_true",
+                        help="按主键合并同一行的多次修改，每行只生成一条恢复到最早镜像的回滚语句\n"
+                             "（不能与--group-by-trx同时使用，需要 binlog_row_image=FULL）")
+    parser.add_argument("--format", dest="output_format", choices=["sql", "jsonl"], default="sql",
+                        help="输出格式：sql（默认，恢复脚本）或 jsonl（每行一个JSON对象，带binlog坐标、GTID、\n"
+                             "修改前后的行镜像和生成的SQL，按binlog顺序增量写出）")
+    parser.add_argument("--follow", dest="follow", action="store_true",
+                        help="持续跟踪模式：保持复制连接，把新的行事件不断写成原生SQL和回滚SQL（按binlog顺序），\n"
+                             "-o 指定文件名前缀，文件按大小滚动，binlog位置记录在 前缀.pos 中，重启后自动继续")
+    parser.add_argument("--rotate-size", dest="rotate_size", type=int, default=256,
+                        help="--follow 模式下单个文件的大小上限（MB），默认256")
+    parser.add_argument("--keep-files", dest="keep_files", type=int, default=0,
+                        help="--follow 模式下保留的文件个数，超过后删除最旧的文件，默认0表示全部保留")
+    parser.add_argument("--compress", dest="compress", choices=["gzip", "zstd"],
+                        help="压缩恢复文件（gzip/zstd），压缩在单独的线程中与解析并行进行，zstd需要安装zstandard模块")
+    parser.add_argument("--profile", dest="profile", action="store_true",
+                        help="统计读取、解码、渲染、排序、写出等各阶段的耗时和队列深度，结束时输出到标准错误")
+    parser.add_argument("--profile-pstats", dest="profile_pstats", type=str,
+                        help="同时用 cProfile 统计主线程并把结果写入该文件（pstats格式），隐含 --profile")
+    parser.add_argument("--profile-stacks", dest="profile_stacks", type=str,
+                        help="同时每5毫秒采样所有线程的调用栈，按火焰图的折叠格式写入该文件，隐含 --profile")
+    parser.add_argument("-o", "--output", dest="output", type=str,
+                        help="恢复文件的路径，默认按库表名和时间自动命名；设置为 - 时写到标准输出，可以通过管道直接传到其它主机。\n"
+                             "写到标准输出或管道时不使用临时文件，回滚SQL只在每个分段（2000个事件）内倒序，"
+                             "需要同时指定 --allow-segment-order")
+    parser.add_argument("--allow-segment-order", dest="allow_segment_order", action="store_true",
+                        help="允许把回滚SQL写到标准输出、管道或设备文件；这时分段之间仍按binlog正序，"
+                             "不能直接导入MySQL整体回滚，只适合按分段查看或自行重排")
     args = parser.parse_args()
 
+    if args.compress == "zstd" and zstandard is None:
+        print("使用 --compress zstd 需要先安装zstandard模块：pip3 install zstandard")
+        sys.exit(1)
+
+    if args.where:
+        try:
+            row_predicate = RowPredicate(args.where)
+        except ValueError as e:
+            print(e)
+            sys.exit(1)
+
+    if args.follow:
+        if args.coalesce_rows or args.group_trx or args.replace_output:
+            print("--follow 不能与 --coalesce、--group-by-trx 或 --replace 同时使用")
+            sys.exit(1)
+        if not args.binlog_file:
+            print("--follow 模式需要用 --binlog-file 指定起始binlog文件")
+            sys.exit(1)
+    elif not args.st or not args.et:
+        print("请提供 --start-time 和 --end-time，或者使用 --follow 持续跟踪模式")
+        sys.exit(1)
+
+    if args.output_format == "jsonl" and (args.coalesce_rows or args.group_trx or args.replace_output):
+        print("--format jsonl 不能与 --coalesce、--group-by-trx 或 --replace 同时使用，jsonl 记录中已包含 replace 形式的回滚SQL")
+        sys.exit(1)
+
+    if args.coalesce_rows and args.group_trx:
+        print("--coalesce 不能与 --group-by-trx 同时使用")
+        sys.exit(1)
+
+    if args.output == "-" and (args.print_output or args.replace_output):
+        print("--output - 写到标准输出时，不能同时使用 --print 或 --replace")
+        sys.exit(1)
+
+    # 只有普通文件才能借助临时文件把分段整体倒序，写到标准输出、管道或设备时跨分段仍是binlog正序，
+    # 直接导入MySQL会先撤销较早的修改，需要用户明确允许
+    if args.output_format == "sql" and not args.follow and args.output and not args.allow_segment_order and (
+            args.output == "-" or os.path.exists(args.output) and not stat.S_ISREG(os.stat(args.output).st_mode)):
+        print(f"写到标准输出、管道或设备文件时回滚SQL只在每个分段（{SEGMENT_EVENTS}个事件）内倒序，"
+              f"分段之间仍按binlog正序，不能直接导入MySQL整体回滚。\n"
+              f"请写到普通文件，或者确认只需要分段内倒序后加上 --allow-segment-order")
+        sys.exit(1)
+
     if args.only_tables:
-        only_tables = args.only_tables[0].split(',') if args.only_tables else None
+        only_tables = [name for arg in args.only_tables for name in arg.split(',') if name]
     else:
         only_tables = None
 
+    if args.only_schemas:
+        only_schemas = [name for arg in args.only_schemas for name in arg.split(',') if name]
+    else:
+        only_schemas = None
+
     if args.only_operation:
         only_operation = args.only_operation.lower()
     else:
         only_operation = None
 
+    binary_as_hex = args.binary_as_hex
+    coalesce_rows = args.coalesce_rows
+    output_format = args.output_format
+
     # 环境检查
-    check_binlog_settings(
+    full_metadata = check_binlog_settings(
         mysql_host=args.mysql_host,
         mysql_port=args.mysql_port,
         mysql_user=args.mysql_user,
         mysql_passwd=args.mysql_passwd,
         mysql_database=args.mysql_database,
-        mysql_charset=args.mysql_charset
+        mysql_charset=args.mysql_charset,
+        coalesce=args.coalesce_rows
     )
+    if not full_metadata:
+        primary_key_settings = {
+            "host": args.mysql_host,
+            "port": args.mysql_port,
+            "user": args.mysql_user,
+            "passwd": args.mysql_passwd,
+            "database": args.mysql_database,
+            "charset": args.mysql_charset
+        }
+
+    if args.profile or args.profile_pstats or args.profile_stacks:
+        profiler = StageProfiler(args.profile_pstats, args.profile_stacks)
 
-    main(
-        only_tables=only_tables,
-        only_operation=only_operation,
-        mysql_host=args.mysql_host,
-        mysql_port=args.mysql_port,
-        mysql_user=args.mysql_user,
-        mysql_passwd=args.mysql_passwd,
-        mysql_database=args.mysql_database,
-        mysql_charset=args.mysql_charset,
-        binlog_file=args.binlog_file,
-        binlog_pos=args.binlog_pos,
-        st=args.st,
-        et=args.et,
-        max_workers=args.max_workers,
-        print_output=args.print_output,
-        replace_output=args.replace_output
-    )
\ No newline at end of file
+    try:
+        if args.follow:
+            follow(
+                only_tables=only_tables,
+                only_schemas=only_schemas,
+                mysql_host=args.mysql_host,
+                mysql_port=args.mysql_port,
+                mysql_user=args.mysql_user,
+                mysql_passwd=args.mysql_passwd,
+                mysql_database=args.mysql_database,
+                mysql_charset=args.mysql_charset,
+                binlog_file=args.binlog_file,
+                binlog_pos=args.binlog_pos,
+                st=args.st,
+                max_workers=args.max_workers,
+                print_output=args.print_output,
+                output=args.output,
+                compress=args.compress,
+                rotate_size=args.rotate_size,
+                keep_files=args.keep_files
+            )
+        else:
+            main(
+                only_tables=only_tables,
+                only_schemas=only_schemas,
+                only_operation=only_operation,
+                mysql_host=args.mysql_host,
+                mysql_port=args.mysql_port,
+                mysql_user=args.mysql_user,
+                mysql_passwd=args.mysql_passwd,
+                mysql_database=args.mysql_database,
+                mysql_charset=args.mysql_charset,
+                binlog_file=args.binlog_file,
+                binlog_pos=args.binlog_pos,
+                st=args.st,
+                et=args.et,
+                max_workers=args.max_workers,
+                print_output=args.print_output,
+                replace_output=args.replace_output,
+                output=args.output,
+                compress=args.compress,
+                group_trx=args.group_trx
+            )
+    finally:
+        if profiler is not None:
+            profiler.finish()
@@ -0,0 +1,258 @@
+#!/usr/bin/env python3
+"""
+reverse_sql.py 和 mysqlstat.py --binlog 的处理性能基准测试，不需要连接MySQL。
+构造合成的 WriteRowsEvent / UpdateRowsEvent / DeleteRowsEvent，直接调用 process_binlogevent 并写出恢复SQL，
+再把同样的事件通过模拟的事件流交给 mysqlstat 的 binlog 统计，
+输出每个场景的 events/s、rows/s、输出字节/s，以及整个进程的峰值内存（ru_maxrss 是进程级的最高水位，
+不能区分场景，所以只报告一次，也不参与基线比较）。
+
+结果可以保存为JSON，之后用 --compare 与基线比较，rows/s 下降超过阈值时以非0状态退出。
+
+shell> python3 reverse_sql_benchmark.py --events 2000 --rows-per-event 10 --columns 12
+shell> python3 reverse_sql_benchmark.py --types int,varchar,json --row-size 512 --json-out base.json
+shell> python3 reverse_sql_benchmark.py --types int,varchar,json --row-size 512 --compare base.json
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import resource
+import sys
+import time
+from decimal import Decimal
+
+from pymysqlreplication.constants import FIELD_TYPE
+from pymysqlreplication.row_event import (
+    WriteRowsEvent,
+    UpdateRowsEvent,
+    DeleteRowsEvent
+)
+
+import reverse_sql
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "bin"))
+import mysqlstat
+
+# 可选的列类型：类型名 -> (binlog字段类型, 生成第 i 个值的函数)，字符串类的值按 --row-size 填充
+COLUMN_TYPES = {
+    "tinyint": (FIELD_TYPE.TINY, lambda i, size: i % 128),
+    "int": (FIELD_TYPE.LONG, lambda i, size: None if i % 7 == 0 else i % 100000),
+    "bigint": (FIELD_TYPE.LONGLONG, lambda i, size: i),
+    "double": (FIELD_TYPE.DOUBLE, lambda i, size: i / 3),
+    "decimal": (FIELD_TYPE.NEWDECIMAL, lambda i, size: Decimal(i) / 100),
+    "varchar": (FIELD_TYPE.VARCHAR, lambda i, size: f"name_{i}_".ljust(size, "x")),
+    "datetime": (FIELD_TYPE.DATETIME2, lambda i, size: datetime.datetime(2023, 7, 6, 10, 0, i % 60)),
+    "date": (FIELD_TYPE.DATE, lambda i, size: datetime.date(2023, 7, 1 + i % 28)),
+    "blob": (FIELD_TYPE.BLOB, lambda i, size: ("text value it's " * (size // 16 + 1))[:size]),
+    "json": (FIELD_TYPE.JSON, lambda i, size: {"id": i, "tags": ["a", "b"], "note": "n" * size}),
+}
+
+DEFAULT_TYPES = "bigint,varchar,decimal,datetime,int,blob"
+
+# 与基线比较时，rows/s 下降超过这个比例视为性能回退
+DEFAULT_THRESHOLD = 0.10
+
+
+class FakeColumn(object):
+    def __init__(self, name, column_type):
+        self.name = name
+        self.type = column_type
+        self.unsigned = False
+        self.character_set_name = None
+
+
+class FakeStream(object):
+    """代替 BinLogStreamReader 的事件流，按顺序返回事先构造好的事件"""
+
+    def __init__(self, events, log_file="mysql-bin.000001"):
+        self.events = events
+        self.log_file = log_file
+        self.log_pos = 4
+
+    def __iter__(self):
+        return iter(self.events)
+
+    def close(self):
+        pass
+
+
+class CountingWriter(object):
+    """代替 OutputWriter，只统计写出的字节数"""
+
+    def __init__(self):
+        self.bytes_written = 0
+
+    def write(self, data):
+        self.bytes_written += len(data)
+
+
+def make_event(event_class, table_id, columns, rows, timestamp):
+    """不经过协议解析，直接构造带有行数据的事件对象"""
+    event = event_class.__new__(event_class)
+    event.schema = "bench"
+    event.table = f"t_{table_id}"
+    event.table_id = table_id
+    event.timestamp = timestamp
+    event.columns = columns
+    event.primary_key = columns[0].name
+    event._RowsEvent__rows = rows
+    return event
+
+
+def make_columns(type_names, column_count):
+    return [FakeColumn(f"c{i}", COLUMN_TYPES[type_names[i % len(type_names)]][0]) for i in range(column_count)]
+
+
+def make_values(columns, type_names, seed, row_size):
+    return {column.name: COLUMN_TYPES[type_names[i % len(type_names)]][1](seed + i, row_size)
+            for i, column in enumerate(columns)}
+
+
+def build_events(event_class, events, rows_per_event, columns, type_names, row_size, timestamp):
+    result = []
+    for n in range(events):
+        rows = []
+        for r in range(rows_per_event):
+            seed = n * rows_per_event + r
+            if event_class is UpdateRowsEvent:
+                rows.append({"before_values": make_values(columns, type_names, seed, row_size),
+                             "after_values": make_values(columns, type_names, seed + 1, row_size)})
+            else:
+                rows.append({"values": make_values(columns, type_names, seed, row_size)})
+        result.append(make_event(event_class, 1, columns, rows, timestamp))
+    return result
+
+
+def peak_rss_mb():
+    # Linux 上 ru_maxrss 的单位是KB，macOS 上是字节
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def measure(events, rows, elapsed, output_bytes=0):
+    return {
+        "events_per_s": round(events / elapsed),
+        "rows_per_s": round(rows / elapsed),
+        "output_bytes_per_s": round(output_bytes / elapsed),
+    }
+
+
+def bench_reverse_sql(batch, timestamp):
+    """处理一批事件并写出恢复SQL，返回 (耗时, 输出字节数)"""
+    reverse_sql.renderer_cache.clear()
+    writer = CountingWriter()
+
+    started = time.perf_counter()
+    for seq, binlogevent in enumerate(batch):
+        reverse_sql.process_binlogevent(binlogevent, timestamp, timestamp, seq)
+    items = sorted(reverse_sql.drain_queue(reverse_sql.result_queue), key=lambda x: x["seq"])
+    reverse_sql.drain_queue(reverse_sql.result_queue_replace)
+    reverse_sql.write_results(reversed(items), writer)
+    elapsed = time.perf_counter() - started
+
+    return elapsed, writer.bytes_written
+
+
+def bench_analyzer(batch):
+    started = time.perf_counter()
+    mysqlstat.count_binlog_events(FakeStream(batch), {"mysql-bin.000001"})
+    return time.perf_counter() - started
+
+
+def run(events, rows_per_event, column_count, type_names=None, row_size=32, repeat=1):
+    """每个场景运行 repeat 次取最快的一次，返回 {场景: 指标}"""
+    type_names = type_names or DEFAULT_TYPES.split(",")
+    columns = make_columns(type_names, column_count)
+    timestamp = int(time.time())
+    rows = events * rows_per_event
+    results = {}
+    batches = []
+
+    for name, event_class in (("insert", WriteRowsEvent), ("update", UpdateRowsEvent), ("delete", DeleteRowsEvent)):
+        batch = build_events(event_class, events, rows_per_event, columns, type_names, row_size, timestamp)
+        batches.extend(batch)
+        elapsed, output_bytes = min(bench_reverse_sql(batch, timestamp) for _ in range(repeat))
+        results[name] = measure(events, rows, elapsed, output_bytes)
+
+    elapsed = min(bench_analyzer(batches) for _ in range(repeat))
+    results["analyze_binlog"] = measure(len(batches), len(batches) * rows_per_event, elapsed)
+    return results
+
+
+def compare(results, baseline, threshold):
+    """打印与基线的对比，返回 rows/s 下降超过阈值的场景列表"""
+    regressions = []
+    print(f"\n{'':<16}{'baseline':>14}{'current':>14}{'change':>10}")
+    for name, metrics in results.items():
+        if name not in baseline:
+            continue
+        before = baseline[name]["rows_per_s"]
+        after = metrics["rows_per_s"]
+        change = (after - before) / before if before else 0.0
+        flag = ""
+        if change < -threshold:
+            regressions.append(name)
+            flag = "  REGRESSION"
+        print(f"{name:<16}{before:>14,}{after:>14,}{change:>+10.1%}{flag}")
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="reverse_sql.py 和 mysqlstat --binlog 处理性能基准测试")
+    parser.add_argument("--events", type=int, default=2000, help="每种事件类型的事件数量，默认2000")
+    parser.add_argument("--rows-per-event", dest="rows_per_event", type=int, default=10, help="每个事件的行数，默认10")
+    parser.add_argument("--columns", type=int, default=12, help="合成表的列数，默认12")
+    parser.add_argument("--types", type=str, default=DEFAULT_TYPES,
+                        help=f"按顺序循环使用的列类型，逗号分隔，默认 {DEFAULT_TYPES}，可选：{','.join(COLUMN_TYPES)}")
+    parser.add_argument("--row-size", dest="row_size", type=int, default=32,
+                        help="varchar/blob/json 列的值长度（字节），默认32")
+    parser.add_argument("--repeat", type=int, default=3, help="每个场景运行的次数，取最快的一次，默认3")
+    parser.add_argument("--json-out", dest="json_out", type=str, help="把结果保存为JSON文件，作为以后比较的基线")
+    parser.add_argument("--compare", type=str, help="与之前保存的JSON结果比较")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="rows/s 下降超过该比例时视为回退并以状态1退出，默认0.10")
+    args = parser.parse_args()
+
+    type_names = [name.strip() for name in args.types.split(",") if name.strip()]
+    unknown = [name for name in type_names if name not in COLUMN_TYPES]
+    if unknown:
+        print(f"不支持的列类型：{', '.join(unknown)}，可选：{', '.join(COLUMN_TYPES)}")
+        sys.exit(1)
+
+    results = run(args.events, args.rows_per_event, args.columns, type_names, args.row_size, args.repeat)
+
+    process_peak_rss_mb = peak_rss_mb()
+
+    print(f"{'':<16}{'events/s':>12}{'rows/s':>14}{'MB/s':>10}")
+    for name, metrics in results.items():
+        print(f"{name:<16}{metrics['events_per_s']:>12,}{metrics['rows_per_s']:>14,}"
+              f"{metrics['output_bytes_per_s'] / 1024 / 1024:>10.1f}")
+    print(f"\n进程峰值内存（所有场景合计）：{process_peak_rss_mb} MB")
+
+    report = {
+        "time": datetime.datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "params": {
+            "events": args.events,
+            "rows_per_event": args.rows_per_event,
+            "columns": args.columns,
+            "types": type_names,
+            "row_size": args.row_size,
+            "repeat": args.repeat,
+        },
+        "results": results,
+        "process_peak_rss_mb": process_peak_rss_mb,
+    }
+
+    if args.json_out:
+        with open(args.json_out, "w") as f:
+            json.dump(report, f, indent=2)
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if baseline.get("params") != report["params"]:
+            print("\n注意：基线的测试参数与本次不同，比较结果仅供参考")
+        if compare(results, baseline["results"], args.threshold):
+            sys.exit(1)